@@ -0,0 +1,115 @@
+import pandas as pd
+import streamlit as st
+from interface.preprocessing import preprocess
+from interface.store import schema_columns
+
+PRICE_BINS = [0, 10000, 25000, 50000, 75000, 100000, 150000, 200000, 300000, 500000, 1000000, float('inf')]
+PRICE_LABELS = ['<10k', '10-25k', '25-50k', '50-75k', '75-100k', '100-150k', '150-200k', '200-300k', '300-500k', '500k-1M', '>1M']
+AREA_BINS = [0, 50, 100, 150, 200, 250, 300, 400, 500, float('inf')]
+AREA_LABELS = ['<50', '50-100', '100-150', '150-200', '200-250', '250-300', '300-400', '400-500', '>500']
+TRUE_REGIONS = [
+    'Чуйская область', 'Ошская область', 'Иссык-Кульская область',
+    'Джалал-Абадская область', 'Баткенская область', 'Таласская область',
+    'Нарынская область'
+]
+
+
+class IncrementalAggregates:
+    def __init__(self):
+        self.rows = 0
+        self.parts = {}
+
+    def merge(self, name, series):
+        current = self.parts.get(name)
+        self.parts[name] = series if current is None else current.add(series, fill_value=0)
+
+    def add(self, df):
+        self.rows += len(df)
+        self.merge('price_bins', pd.cut(df['Цена (int)'], bins=PRICE_BINS, labels=PRICE_LABELS).value_counts())
+
+        regions = df[df['Область'].isin(TRUE_REGIONS)].groupby('Область')['Цена (int)']
+        self.merge('region_price_sum', regions.sum())
+        self.merge('region_price_count', regions.count())
+
+        bishkek_districts = df.loc[(df['Город/Село'] == 'Бишкек') & df['Район'].notna()]
+        if not bishkek_districts.empty:
+            districts = bishkek_districts.groupby('Район')['Цена (int)']
+            self.merge('district_counts', bishkek_districts['Район'].value_counts())
+            self.merge('district_price_sum', districts.sum())
+            self.merge('district_price_count', districts.count())
+
+        self.merge('offer_type_counts', df['Тип предложения'].value_counts())
+        if 'Площадь участка' in df.columns:
+            self.merge('plot_area_counts', df['Площадь участка'].value_counts())
+        if 'Коммуникации' in df.columns:
+            splitted = df['Коммуникации'].dropna().str.split(',').explode().str.strip()
+            self.merge('communication_counts', splitted.value_counts())
+        if 'Rooms' in df.columns:
+            self.merge('room_counts', df['Rooms'].value_counts())
+        if 'House Area' in df.columns:
+            self.merge('house_area_bins', pd.cut(df['House Area'], bins=AREA_BINS, labels=AREA_LABELS).value_counts())
+        if 'Отопление' in df.columns:
+            self.merge('heating_counts', df['Отопление'].value_counts())
+
+    def counts(self, name, columns):
+        series = self.parts.get(name)
+        if series is None:
+            return None
+        table = series.astype(int).sort_values(ascending=False, kind='stable').reset_index()
+        table.columns = columns
+        return table
+
+    def binned(self, name, labels, columns):
+        series = self.parts.get(name)
+        if series is None:
+            return None
+        table = series.astype(int).reindex(labels, fill_value=0).reset_index()
+        table.columns = columns
+        return table
+
+    def mean(self, name):
+        price_sum = self.parts.get(f'{name}_price_sum')
+        if price_sum is None:
+            return None
+        return (price_sum / self.parts[f'{name}_price_count'].replace(0, float('nan'))).sort_values(ascending=False)
+
+    def tables(self):
+        region_avg = self.mean('region')
+        region_avg_price = pd.DataFrame(columns=['Область', 'avg_price'])
+        if region_avg is not None:
+            region_avg_price = region_avg.rename('avg_price').rename_axis('Область').reset_index()
+        region_avg_price['Rank'] = range(1, len(region_avg_price) + 1)
+
+        district_avg = self.mean('district')
+        if district_avg is not None:
+            district_avg = district_avg.rename('Цена (int)').rename_axis('Район').reset_index()
+
+        room_counts = self.counts('room_counts', ['Rooms', 'Count'])
+        if room_counts is not None:
+            room_counts['Rooms'] = pd.Categorical(room_counts['Rooms'], categories=['1', '2', '3', '4', '5', '6+'], ordered=True)
+            room_counts = room_counts.sort_values('Rooms')
+
+        return {
+            'price_bins': self.binned('price_bins', PRICE_LABELS, ['Range', 'Count']),
+            'district_counts': self.counts('district_counts', ['Район', 'count']),
+            'region_avg_price': region_avg_price,
+            'plot_area_counts': self.counts('plot_area_counts', ['Площадь участка', 'count']),
+            'communication_counts': self.counts('communication_counts', ['Коммуникация', 'count']),
+            'bishkek_district_avg': district_avg,
+            'offer_type_counts': self.counts('offer_type_counts', ['Тип предложения', 'count']),
+            'room_counts': room_counts,
+            'house_area_bins': self.binned('house_area_bins', AREA_LABELS, ['Area Range', 'Count']),
+            'heating_counts': self.counts('heating_counts', ['Heating Type', 'Count']),
+        }
+
+
+def filter_key(filters):
+    return tuple((key, value if isinstance(value, str) else tuple(value)) for key, value in filters.items() if value)
+
+
+@st.cache_data(show_spinner=False)
+def load_store_aggregates(_store, version, property_type, filters):
+    aggregates = IncrementalAggregates()
+    for chunk in _store.iter_frames(schema_columns([property_type]), dict(filters)):
+        aggregates.add(preprocess(chunk, property_type))
+    return aggregates.tables()
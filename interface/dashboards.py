@@ -1,13 +1,6 @@
-import pandas as pd
 import plotly.express as px
-import re
 
-def price_distribution_dashboard(df):
-    bins = [0, 10000, 25000, 50000, 75000, 100000, 150000, 200000, 300000, 500000, 1000000, float('inf')]
-    labels = ['<10k', '10-25k', '25-50k', '50-75k', '75-100k', '100-150k', '150-200k', '200-300k', '300-500k', '500k-1M', '>1M']
-    df['Price Range'] = pd.cut(df['Цена (int)'], bins=bins, labels=labels)
-    price_bins = df['Price Range'].value_counts().sort_index().reset_index()
-    price_bins.columns = ['Range', 'Count']
+def price_distribution_dashboard(price_bins):
     fig = px.bar(
         price_bins,
         x='Range',
@@ -19,11 +12,8 @@ def price_distribution_dashboard(df):
     fig.update_layout(coloraxis_showscale=False)
     return fig
 
-def district_distribution_dashboard(df):
-    bishkek_df = df[df['Город/Село'] == 'Бишкек']
-    if not bishkek_df.empty and 'Район' in bishkek_df.columns:
-        district_counts = bishkek_df['Район'].dropna().value_counts().reset_index()
-        district_counts.columns = ['Район', 'count']
+def district_distribution_dashboard(district_counts):
+    if district_counts is not None:
         fig = px.treemap(
             district_counts,
             path=['Район'],
@@ -33,15 +23,7 @@ def district_distribution_dashboard(df):
         return fig
     return None
 
-def region_avg_price_dashboard(df):
-    true_regions = [
-        'Чуйская область', 'Ошская область', 'Иссык-Кульская область',
-        'Джалал-Абадская область', 'Баткенская область', 'Таласская область',
-        'Нарынская область'
-    ]
-    region_avg_price = df[df['Область'].isin(true_regions)].groupby('Область').agg(avg_price=('Цена (int)', 'mean')).reset_index()
-    region_avg_price = region_avg_price.sort_values('avg_price', ascending=False)
-    region_avg_price['Rank'] = range(1, len(region_avg_price) + 1)
+def region_avg_price_dashboard(region_avg_price):
     fig = px.line(
         region_avg_price,
         x='Rank',
@@ -58,22 +40,16 @@ def region_avg_price_dashboard(df):
     )
     return fig
 
-def plot_area_distribution_dashboard(df, top_n=30):
-    if 'Площадь участка' in df.columns:
-        area_counts = df['Площадь участка'].value_counts().reset_index()
-        area_counts.columns = ['Площадь участка', 'count']
+def plot_area_distribution_dashboard(area_counts, top_n=30):
+    if area_counts is not None:
         if top_n:
             area_counts = area_counts.head(top_n)
         fig = px.bar(area_counts, x='Площадь участка', y='count', title="Plot Sizes Distribution")
         return fig
     return None
 
-def communication_access_dashboard(df):
-    if 'Коммуникации' in df.columns:
-        comm_series = df['Коммуникации'].dropna()
-        splitted = comm_series.str.split(',').explode().str.strip()
-        comm_counts = splitted.value_counts().reset_index()
-        comm_counts.columns = ['Коммуникация', 'count']
+def communication_access_dashboard(comm_counts):
+    if comm_counts is not None:
         top_comms = comm_counts.head(30)
         fig = px.pie(
             top_comms,
@@ -85,10 +61,8 @@ def communication_access_dashboard(df):
         return fig
     return None
 
-def bishkek_district_avg_price_dashboard(df):
-    bishkek_df = df[(df['Город/Село'] == 'Бишкек') & (df['Район'].notna())]
-    if not bishkek_df.empty:
-        district_avg = bishkek_df.groupby('Район')['Цена (int)'].mean().sort_values(ascending=False).reset_index()
+def bishkek_district_avg_price_dashboard(district_avg):
+    if district_avg is not None:
         top_10 = district_avg.head(10)
         fig_top = px.bar(
             top_10,
@@ -107,10 +81,8 @@ def bishkek_district_avg_price_dashboard(df):
         return fig_top, fig_all
     return None, None
 
-def bishkek_district_avg_price_private_house_dashboard(df):
-    bishkek_df = df[(df['Город/Село'] == 'Бишкек') & (df['Район'].notna())]
-    if not bishkek_df.empty:
-        district_avg = bishkek_df.groupby('Район')['Цена (int)'].mean().sort_values(ascending=False).reset_index()
+def bishkek_district_avg_price_private_house_dashboard(district_avg):
+    if district_avg is not None:
         top_10 = district_avg.head(20)
         fig_top = px.bar(
             top_10,
@@ -135,9 +107,7 @@ def bishkek_district_avg_price_private_house_dashboard(df):
         return fig_top, fig_all
     return None, None
 
-def offer_type_distribution_dashboard(df):
-    offer_type_counts = df['Тип предложения'].value_counts().reset_index()
-    offer_type_counts.columns = ['Тип предложения', 'count']
+def offer_type_distribution_dashboard(offer_type_counts):
     fig = px.bar(
         offer_type_counts,
         x='Тип предложения',
@@ -147,12 +117,8 @@ def offer_type_distribution_dashboard(df):
     )
     return fig
 
-def rooms_distribution_dashboard(df):
-    if 'Rooms' in df.columns:
-        room_counts = df['Rooms'].value_counts().reset_index()
-        room_counts.columns = ['Rooms', 'Count']
-        room_counts['Rooms'] = pd.Categorical(room_counts['Rooms'], categories=['1', '2', '3', '4', '5', '6+'], ordered=True)
-        room_counts = room_counts.sort_values('Rooms')
+def rooms_distribution_dashboard(room_counts):
+    if room_counts is not None:
         fig = px.bar(
             room_counts,
             x='Rooms',
@@ -163,13 +129,8 @@ def rooms_distribution_dashboard(df):
         return fig
     return None
 
-def house_area_distribution_dashboard(df):
-    if 'House Area' in df.columns:
-        bins = [0, 50, 100, 150, 200, 250, 300, 400, 500, float('inf')]
-        labels = ['<50', '50-100', '100-150', '150-200', '200-250', '250-300', '300-400', '400-500', '>500']
-        df['Area Range'] = pd.cut(df['House Area'], bins=bins, labels=labels)
-        area_counts = df['Area Range'].value_counts().sort_index().reset_index()
-        area_counts.columns = ['Area Range', 'Count']
+def house_area_distribution_dashboard(area_counts):
+    if area_counts is not None:
         fig = px.bar(
             area_counts,
             x='Area Range',
@@ -180,10 +141,8 @@ def house_area_distribution_dashboard(df):
         return fig
     return None
 
-def heating_type_distribution_dashboard(df):
-    if 'Отопление' in df.columns:
-        heating_counts = df['Отопление'].value_counts().reset_index()
-        heating_counts.columns = ['Heating Type', 'Count']
+def heating_type_distribution_dashboard(heating_counts):
+    if heating_counts is not None:
         fig = px.pie(
             heating_counts,
             names='Heating Type',
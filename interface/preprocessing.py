@@ -0,0 +1,22 @@
+import pandas as pd
+from parser_module.transform import typed_columns
+
+
+def preprocess(df, property_type):
+    typed = typed_columns(df)
+    if property_type != "sector":
+        typed = typed.drop(columns=['Площадь (сотки)'], errors='ignore')
+    if property_type != "private_house":
+        typed = typed.drop(columns=['House Area', 'Rooms'], errors='ignore')
+
+    if 'Rooms' in typed.columns:
+        rooms = typed['Rooms']
+        typed['Rooms'] = rooms.astype('string').mask((rooms >= 6).fillna(False), '6+')
+
+    return pd.concat([df.drop(columns=typed.columns, errors='ignore'), typed], axis=1)
+
+
+def records_frame(rows, columns, property_type):
+    df = pd.DataFrame(rows, columns=columns)
+    return preprocess(df.mask(df == ''), property_type)
+
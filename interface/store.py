@@ -0,0 +1,170 @@
+import re
+import sqlite3
+import sys
+import threading
+from pathlib import Path
+import pandas as pd
+from parser_module.config import SCHEMAS
+from parser_module.transform import typed_columns
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+TYPED_COLUMNS = {'Цена (int)': 'DOUBLE', 'Площадь (сотки)': 'DOUBLE', 'House Area': 'DOUBLE', 'Rooms': 'INTEGER'}
+INDEXED_COLUMNS = ['Область', 'Город/Село', 'Район', 'Цена (int)', 'Площадь (сотки)', 'House Area']
+FILTER_COLUMNS = {'deal': 'deal', 'property_type': 'property_type', 'region': 'Область', 'city': 'Город/Село', 'district': 'Район'}
+SOURCE_PATTERN = re.compile(r'^(sale|rent)_([a-z_]+)\.csv$')
+
+
+def quote(column):
+    return '"' + column.replace('"', '""') + '"'
+
+
+def schema_columns(property_types=None):
+    columns = []
+    for property_type, config in SCHEMAS.items():
+        if property_types and property_type not in property_types:
+            continue
+        for column in config().get_columns():
+            if column not in columns:
+                columns.append(column)
+    return columns
+
+
+class ListingStore:
+    def __init__(self, path='data/listings', backend=None):
+        self.backend = backend or ('duckdb' if duckdb is not None else 'sqlite')
+        self.path = Path(path).with_suffix(f'.{self.backend}')
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        if self.backend == 'duckdb':
+            self.conn = duckdb.connect(str(self.path))
+        else:
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.raw_columns = schema_columns()
+        self.columns = ['deal', 'property_type', 'source'] + self.raw_columns + list(TYPED_COLUMNS)
+        self.create()
+
+    def create(self):
+        definitions = [f'{quote(column)} TEXT' for column in ['deal', 'property_type', 'source'] + self.raw_columns]
+        definitions += [f'{quote(column)} {kind}' for column, kind in TYPED_COLUMNS.items()]
+        with self.lock:
+            self.conn.execute(f'CREATE TABLE IF NOT EXISTS listings ({", ".join(definitions)})')
+            self.conn.execute('CREATE TABLE IF NOT EXISTS sources (path TEXT PRIMARY KEY, mtime DOUBLE, size BIGINT, rows BIGINT)')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS listings_kind ON listings (property_type, deal)')
+            for i, column in enumerate(INDEXED_COLUMNS):
+                self.conn.execute(f'CREATE INDEX IF NOT EXISTS listings_idx_{i} ON listings ({quote(column)})')
+            self.conn.commit()
+
+    def append(self, df):
+        if self.backend == 'duckdb':
+            self.conn.append('listings', df)
+        else:
+            df.to_sql('listings', self.conn, if_exists='append', index=False)
+
+    def ingest(self, path, deal, property_type, chunksize=50000):
+        path = Path(path)
+        stat = path.stat()
+        rows = 0
+        with self.lock:
+            self.conn.execute('DELETE FROM listings WHERE source = ?', (str(path),))
+            for chunk in pd.read_csv(path, dtype=str, chunksize=chunksize):
+                typed = typed_columns(chunk)
+                frame = chunk.reindex(columns=self.raw_columns)
+                frame.insert(0, 'source', str(path))
+                frame.insert(0, 'property_type', property_type)
+                frame.insert(0, 'deal', deal)
+                frame = frame.astype(object).where(frame.notna(), None)
+                for column in TYPED_COLUMNS:
+                    frame[column] = typed[column] if column in typed.columns else None
+                frame['Rooms'] = frame['Rooms'].astype('Int64')
+                self.append(frame[self.columns])
+                rows += len(chunk)
+            self.conn.execute('DELETE FROM sources WHERE path = ?', (str(path),))
+            self.conn.execute('INSERT INTO sources VALUES (?, ?, ?, ?)', (str(path), stat.st_mtime, stat.st_size, rows))
+            self.conn.commit()
+        return rows
+
+    def sync(self, data_dir='data'):
+        known = {path: (mtime, size) for path, mtime, size in self.query('SELECT path, mtime, size FROM sources')}
+        found = set()
+        ingested = 0
+        for path in sorted(Path(data_dir).glob('*.csv')):
+            match = SOURCE_PATTERN.match(path.name)
+            if match is None or match.group(2) not in SCHEMAS:
+                continue
+            found.add(str(path))
+            stat = path.stat()
+            if known.get(str(path)) != (stat.st_mtime, stat.st_size):
+                self.ingest(path, match.group(1), match.group(2))
+                ingested += 1
+
+        with self.lock:
+            for path in set(known) - found:
+                self.conn.execute('DELETE FROM listings WHERE source = ?', (path,))
+                self.conn.execute('DELETE FROM sources WHERE path = ?', (path,))
+            self.conn.commit()
+        return ingested
+
+    def version(self):
+        return tuple(self.query('SELECT path, mtime, size FROM sources ORDER BY path'))
+
+    def query(self, sql, params=()):
+        with self.lock:
+            return [tuple(row) for row in self.conn.execute(sql, params).fetchall()]
+
+    def where(self, filters):
+        clauses, params = [], []
+        for key, value in (filters or {}).items():
+            if key in ('min_price', 'max_price'):
+                if value is not None:
+                    clauses.append(f'{quote("Цена (int)")} {">=" if key == "min_price" else "<="} ?')
+                    params.append(value)
+                continue
+            if not value:
+                continue
+            values = [value] if isinstance(value, str) else list(value)
+            clauses.append(f'{quote(FILTER_COLUMNS[key])} IN ({", ".join("?" * len(values))})')
+            params.extend(values)
+        return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+    def count(self, filters=None):
+        clause, params = self.where(filters)
+        return self.query(f'SELECT COUNT(*) FROM listings{clause}', params)[0][0]
+
+    def distinct(self, column, filters=None):
+        clause, params = self.where(filters)
+        extra = ' AND ' if clause else ' WHERE '
+        rows = self.query(f'SELECT DISTINCT {quote(column)} FROM listings{clause}{extra}{quote(column)} IS NOT NULL ORDER BY 1', params)
+        return [row[0] for row in rows]
+
+    def frame(self, sql, params, columns):
+        return pd.DataFrame(self.query(sql, params), columns=columns)
+
+    def top_k(self, column, columns, filters=None, k=10, ascending=False):
+        clause, params = self.where(filters)
+        extra = ' AND ' if clause else ' WHERE '
+        selected = ', '.join(quote(c) for c in columns)
+        order = 'ASC' if ascending else 'DESC'
+        sql = f'SELECT {selected} FROM listings{clause}{extra}{quote(column)} IS NOT NULL ORDER BY {quote(column)} {order} LIMIT {int(k)}'
+        return self.frame(sql, params, columns)
+
+    def iter_frames(self, columns, filters=None, chunksize=50000):
+        clause, params = self.where(filters)
+        selected = ', '.join(quote(c) for c in columns)
+        with self.lock:
+            cursor = self.conn.cursor()
+            cursor.execute(f'SELECT {selected} FROM listings{clause}', params)
+        try:
+            while rows := cursor.fetchmany(chunksize):
+                yield pd.DataFrame([tuple(row) for row in rows], columns=columns)
+        finally:
+            cursor.close()
+
+
+if __name__ == '__main__':
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else 'data'
+    store = ListingStore(Path(data_dir) / 'listings')
+    print(f'Ingested {store.sync(data_dir)} files, {store.count()} listings in {store.path}')
@@ -1,9 +1,8 @@
 import streamlit as st
 import os
 import sys
-import pandas as pd
-import re
 import time
+import pandas as pd
 from pathlib import Path
 import threading
 
@@ -22,7 +21,11 @@ from interface.dashboards import (
     house_area_distribution_dashboard,
     heating_type_distribution_dashboard
 )
-from parser_module.main import Builder
+from interface.preprocessing import records_frame
+from interface.aggregates import IncrementalAggregates, filter_key, load_store_aggregates
+from interface.store import ListingStore
+from parser_module.main import Builder, MultiBuilder
+from parser_module.config import Config
 
 st.set_page_config(page_title='HouseKG Scraper', layout='wide')
 
@@ -32,106 +35,100 @@ def delete_file_after_delay(filepath, delay):
         os.remove(filepath)
         print(f"Deleted {filepath}")
 
-def display_dashboards(df, property_type):
-    # Data preprocessing
-    if 'Цена' in df.columns:
-        df['Цена (int)'] = (
-            df['Цена']
-            .astype(str)
-            .str.replace('$', '', regex=False)
-            .str.replace(' ', '', regex=False)
-            .str.replace(',', '', regex=False)
-            .str.extract(r'(\d+)')[0]
-            .dropna()
-            .astype(float)
-        )
-
-    if property_type == "sector":
-        if 'Площадь участка' in df.columns:
-            df['Площадь (сотки)'] = df['Площадь участка'].str.extract(r'(\d+\.?\d*)').astype(float)
-    elif property_type == "private_house":
-        if 'Название' in df.columns:
-            df['Rooms'] = df['Название'].apply(lambda x: re.search(r'(\d+)-комн', x).group(1) if re.search(r'(\d+)-комн', x) else '6+' if 'и более' in x else None)
-        if 'Площадь' in df.columns:
-            df['House Area'] = df['Площадь'].str.extract(r'(\d+\.?\d*)').astype(float)
-
-    view_type = st.selectbox("Select View Type", ["Visualizations", "Data Tables"], key=f"view_type_{property_type}")
+def frame_top(df):
+    def top(column, columns, ascending=False):
+        if column not in df.columns:
+            return None
+        return df.nsmallest(10, column)[columns] if ascending else df.nlargest(10, column)[columns]
+    return top
+
+def store_top(store, filters):
+    def top(column, columns, ascending=False):
+        return store.top_k(column, columns, filters, ascending=ascending)
+    return top
+
+@st.cache_resource
+def get_store():
+    return ListingStore('data/listings')
+
+def display_dashboards(top, aggs, property_type, section="dashboards"):
+    view_type = st.selectbox("Select View Type", ["Visualizations", "Data Tables"], key=f"view_type_{section}_{property_type}")
 
     if view_type == "Visualizations":
         if property_type == "sector":
             st.subheader("💰 Price Distribution")
-            fig1 = price_distribution_dashboard(df)
+            fig1 = price_distribution_dashboard(aggs['price_bins'])
             st.plotly_chart(fig1, use_container_width=True)
 
             st.subheader("🗺️ Distribution of Listings by Districts of Bishkek")
-            fig2 = district_distribution_dashboard(df)
+            fig2 = district_distribution_dashboard(aggs['district_counts'])
             if fig2:
                 st.plotly_chart(fig2, use_container_width=True)
             else:
                 st.info("No district data available for Bishkek.")
 
             st.subheader("🌍 Average Price by Regions")
-            fig3 = region_avg_price_dashboard(df)
+            fig3 = region_avg_price_dashboard(aggs['region_avg_price'])
             st.plotly_chart(fig3, use_container_width=True)
 
             st.subheader("📐 Plot Area Distribution")
-            fig4 = plot_area_distribution_dashboard(df)
+            fig4 = plot_area_distribution_dashboard(aggs['plot_area_counts'])
             if fig4:
                 st.plotly_chart(fig4, use_container_width=True)
 
             st.subheader("🔌 Communication Access")
-            fig5 = communication_access_dashboard(df)
+            fig5 = communication_access_dashboard(aggs['communication_counts'])
             if fig5:
                 st.plotly_chart(fig5, use_container_width=True)
 
             st.subheader("🏙️ Average Price by Districts in Bishkek")
-            fig_top, fig_all = bishkek_district_avg_price_dashboard(df)
+            fig_top, fig_all = bishkek_district_avg_price_dashboard(aggs['bishkek_district_avg'])
             if fig_top:
                 st.plotly_chart(fig_top, use_container_width=True)
                 with st.expander("Show all districts"):
                     st.plotly_chart(fig_all, use_container_width=True)
 
             st.subheader("📊 Distribution of Listings by Offer Type")
-            fig_offer_type = offer_type_distribution_dashboard(df)
+            fig_offer_type = offer_type_distribution_dashboard(aggs['offer_type_counts'])
             st.plotly_chart(fig_offer_type, use_container_width=True)
 
         elif property_type == "private_house":
             st.subheader("💰 Price Distribution")
-            fig1 = price_distribution_dashboard(df)
+            fig1 = price_distribution_dashboard(aggs['price_bins'])
             st.plotly_chart(fig1, use_container_width=True)
 
             st.subheader("🗺️ Distribution of Listings by Districts of Bishkek")
-            fig2 = district_distribution_dashboard(df)
+            fig2 = district_distribution_dashboard(aggs['district_counts'])
             if fig2:
                 st.plotly_chart(fig2, use_container_width=True)
             else:
                 st.info("No district data available for Bishkek.")
 
             st.subheader("🌍 Average Price by Regions")
-            fig3 = region_avg_price_dashboard(df)
+            fig3 = region_avg_price_dashboard(aggs['region_avg_price'])
             st.plotly_chart(fig3, use_container_width=True)
 
             st.subheader("📊 Distribution of Listings by Offer Type")
-            fig_offer_type = offer_type_distribution_dashboard(df)
+            fig_offer_type = offer_type_distribution_dashboard(aggs['offer_type_counts'])
             st.plotly_chart(fig_offer_type, use_container_width=True)
 
             st.subheader("🏠 Distribution of Number of Rooms")
-            fig_rooms = rooms_distribution_dashboard(df)
+            fig_rooms = rooms_distribution_dashboard(aggs['room_counts'])
             if fig_rooms:
                 st.plotly_chart(fig_rooms, use_container_width=True)
 
             st.subheader("📏 House Area Distribution")
-            fig_area = house_area_distribution_dashboard(df)
+            fig_area = house_area_distribution_dashboard(aggs['house_area_bins'])
             if fig_area:
                 st.plotly_chart(fig_area, use_container_width=True)
 
             st.subheader("🔥 Heating Type Distribution")
-            fig_heating = heating_type_distribution_dashboard(df)
+            fig_heating = heating_type_distribution_dashboard(aggs['heating_counts'])
             if fig_heating:
                 st.plotly_chart(fig_heating, use_container_width=True)
 
             st.subheader("🏙️ Average Price by Districts in Bishkek")
-            fig_top, fig_all = bishkek_district_avg_price_private_house_dashboard(df)
+            fig_top, fig_all = bishkek_district_avg_price_private_house_dashboard(aggs['bishkek_district_avg'])
             if fig_top:
                 st.plotly_chart(fig_top, use_container_width=True)
                 with st.expander("Show all districts"):
@@ -144,42 +141,36 @@ def display_dashboards(df, property_type):
         if property_type == "sector":
             display_columns = ['Название', 'Область', 'Город/Село', 'Район', 'Цена', 'Площадь участка']
             st.write("### 10 Most Expensive Sectors")
-            most_expensive = df.nlargest(10, 'Цена (int)')[display_columns]
-            st.dataframe(most_expensive)
+            st.dataframe(top('Цена (int)', display_columns))
 
             st.write("### 10 Cheapest Sectors")
-            cheapest = df.nsmallest(10, 'Цена (int)')[display_columns]
-            st.dataframe(cheapest)
+            st.dataframe(top('Цена (int)', display_columns, ascending=True))
 
-            if 'Площадь (сотки)' in df.columns:
+            largest = top('Площадь (сотки)', display_columns)
+            if largest is not None:
                 st.write("### 10 Largest Sectors")
-                largest = df.nlargest(10, 'Площадь (сотки)')[display_columns]
                 st.dataframe(largest)
 
                 st.write("### 10 Smallest Sectors")
-                smallest = df.nsmallest(10, 'Площадь (сотки)')[display_columns]
-                st.dataframe(smallest)
+                st.dataframe(top('Площадь (сотки)', display_columns, ascending=True))
             else:
                 st.info("Area data not available.")
 
         elif property_type == "private_house":
             display_columns = ['Название', 'Область', 'Город/Село', 'Район', 'Цена', 'Площадь', 'Кол-во этажей']
             st.write("### 10 Most Expensive Houses")
-            most_expensive = df.nlargest(10, 'Цена (int)')[display_columns]
-            st.dataframe(most_expensive)
+            st.dataframe(top('Цена (int)', display_columns))
 
             st.write("### 10 Cheapest Houses")
-            cheapest = df.nsmallest(10, 'Цена (int)')[display_columns]
-            st.dataframe(cheapest)
+            st.dataframe(top('Цена (int)', display_columns, ascending=True))
 
-            if 'House Area' in df.columns:
+            largest = top('House Area', display_columns)
+            if largest is not None:
                 st.write("### 10 Largest Houses")
-                largest = df.nlargest(10, 'House Area')[display_columns]
                 st.dataframe(largest)
 
                 st.write("### 10 Smallest Houses")
-                smallest = df.nsmallest(10, 'House Area')[display_columns]
-                st.dataframe(smallest)
+                st.dataframe(top('House Area', display_columns, ascending=True))
             else:
                 st.info("House area data not available.")
 
@@ -202,14 +193,24 @@ with tab1:
 with tab2:
     st.title("📊 Dashboards for Real Estate")
     property_type = st.selectbox("Select Property Type for Dashboard", ["sector", "private_house"], key="dashboard_property")
-    file_path = f"data/sale_{property_type}.csv"
+    deals = st.multiselect("Select Deal Types", ["sale", "rent"], default=["sale"], key="dashboard_deal")
+    store = get_store()
+    store.sync('data')
+    scope = {'property_type': property_type, 'deal': deals}
 
-    if not os.path.exists(file_path):
+    if store.count(scope) == 0:
         st.warning(f"No data found for {property_type}. Please scrape it first.")
     else:
-        df = pd.read_csv(file_path)
-        st.success(f"Loaded {len(df)} rows from {file_path}")
-        display_dashboards(df, property_type)
+        regions = st.multiselect("Filter by Region", store.distinct('Область', scope), key="dashboard_region")
+        districts = st.multiselect("Filter by District", store.distinct('Район', {**scope, 'region': regions}), key="dashboard_district")
+        filters = {**scope, 'region': regions, 'district': districts}
+        total = store.count(filters)
+        if total == 0:
+            st.info("No listings match the selected filters.")
+        else:
+            st.success(f"Loaded {total} rows from {store.path}")
+            aggs = load_store_aggregates(store, store.version(), property_type, filter_key(filters))
+            display_dashboards(store_top(store, filters), aggs, property_type)
 
 with tab3:
     st.title("⚙️ Dynamic Data Parsing")
@@ -223,17 +224,49 @@ with tab3:
         timestamp = int(time.time())
         unique_output_path = f"data/temp_{deal}_{property_type}_{timestamp}.csv"
 
-        builder = Builder(property_type=property_type, start_page=start_page, stop_page=stop_page, deal=deal, output_path=unique_output_path)
+        builder = Builder(property_type=property_type, start_page=start_page, stop_page=stop_page, deal=deal, output_path=unique_output_path, max_concurrency=threads)
         runner = builder.build()
 
         runner.parser.cache_lifetime = 0 
 
         st.info('⏳ Scraping started...')
-        duration = runner.run()
-        st.success(f'Scraping finished in {duration} seconds.')
-
-        df = pd.read_csv(unique_output_path)
-        display_dashboards(df, property_type)
+        progress = st.empty()
+        live_price = st.empty()
+        live_offer_type = st.empty()
+        aggregates = IncrementalAggregates()
+        frames, batch = [], []
+        last_update = time.time()
+
+        def flush_batch(update):
+            frame = records_frame(batch, runner.filemanager.columns, property_type)
+            frames.append(frame)
+            aggregates.add(frame)
+            batch.clear()
+            live_aggs = aggregates.tables()
+            progress.json(runner.stats.as_dict())
+            live_price.plotly_chart(price_distribution_dashboard(live_aggs['price_bins']), use_container_width=True, key=f"live_price_{update}")
+            live_offer_type.plotly_chart(offer_type_distribution_dashboard(live_aggs['offer_type_counts']), use_container_width=True, key=f"live_offer_type_{update}")
+
+        for record in runner.iter_records():
+            batch.append(record.values)
+            if len(batch) >= 50 or time.time() - last_update > 2:
+                flush_batch(len(frames))
+                last_update = time.time()
+        if batch:
+            flush_batch(len(frames))
+
+        live_price.empty()
+        live_offer_type.empty()
+        progress.json(runner.stats.as_dict())
+        st.success(f'Scraping finished in {runner.duration} seconds.')
+        with st.expander("Request concurrency and latency"):
+            st.json(runner.parser.limiters.stats())
+
+        if frames:
+            df = pd.concat(frames, ignore_index=True)
+            display_dashboards(frame_top(df), aggregates.tables(), property_type, section="live")
+        else:
+            st.warning("No listings were scraped.")
 
         threading.Thread(target=delete_file_after_delay, args=(unique_output_path, 60)).start()
 
@@ -254,13 +287,17 @@ with tab4:
                 st.error("Incorrect password. Try again.")
     else:
         st.title("Web Scraper Interface")
-        property_type = st.selectbox('Select property type:', ['private_house', 'sector'])
+        property_type = st.selectbox('Select property type:', ['private_house', 'sector'] + [t for t in Config.property_types if t not in ('private_house', 'sector')] + ['all'])
         deal = st.selectbox('Select deal type:', ['sale', 'rent'])
         start_page = st.number_input('Start page', min_value=1, value=1)
-        stop_page = st.number_input('Stop page', min_value=2, value=2)
+        crawl_all = st.checkbox('Crawl all pages', value=False)
+        stop_page = None if crawl_all else st.number_input('Stop page', min_value=2, value=2)
 
         if st.button('Start Scraping'):
-            builder = Builder(property_type, start_page, stop_page, deal, output_path=f'data/{deal}_{property_type}.csv')
+            if property_type == 'all':
+                builder = MultiBuilder(None, start_page, stop_page, deal, output_dir='data', crawl_all=crawl_all)
+            else:
+                builder = Builder(property_type, start_page, stop_page, deal, output_path=f'data/{deal}_{property_type}.csv', crawl_all=crawl_all)
             scraper = builder.build()
             time_taken = scraper.run()
             st.success(f"Scraping completed in {time_taken} seconds!")
\ No newline at end of file
@@ -0,0 +1,99 @@
+# __main__.py
+import argparse
+import json
+import sys
+from pathlib import Path
+from parser_module.config import Config
+from parser_module.dedup import SEEN
+from parser_module.main import MultiBuilder
+from parser_module.writers import WRITERS
+
+EXIT_OK = 0
+EXIT_PARTIAL = 1
+EXIT_USAGE = 2
+EXIT_FAILED = 3
+EXIT_INTERRUPTED = 130
+
+
+def split_choices(value: str, choices) -> list[str]:
+    if value == 'all':
+        return list(choices)
+    items = [item.strip() for item in value.split(',') if item.strip()]
+    unknown = [item for item in items if item not in choices]
+    if unknown or not items:
+        raise argparse.ArgumentTypeError(f"unknown value(s) {', '.join(unknown) or value!r}; choose from {', '.join(choices)} or 'all'")
+    return items
+
+
+def make_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='python -m parser_module', description='Headless house.kg crawl')
+    parser.add_argument('--types', default='sector', type=lambda value: split_choices(value, Config.property_types),
+                        help="comma-separated property types or 'all'")
+    parser.add_argument('--deals', default='sale', type=lambda value: split_choices(value, Config.deal_types),
+                        help="comma-separated deal types or 'all'")
+    parser.add_argument('--start', type=int, default=1)
+    parser.add_argument('--stop', default='2', help="exclusive stop page or 'all' to crawl until the last page")
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--parse-workers', type=int, default=0)
+    parser.add_argument('--async', dest='use_async', action='store_true')
+    parser.add_argument('--cache-backend', default='sqlite', choices=['sqlite', 'file'])
+    parser.add_argument('--output-format', default='csv', choices=list(WRITERS))
+    parser.add_argument('--output-dir', default=None)
+    parser.add_argument('--incremental', action='store_true')
+    parser.add_argument('--stop-known-ratio', type=float, default=None)
+    parser.add_argument('--dedup', default='set', choices=list(SEEN), help="'bloom' keeps memory flat on very large crawls")
+    parser.add_argument('--seen-size', type=int, default=None,
+                        help='expected distinct units per run (default: pages x Config.units_per_page x 2)')
+    parser.add_argument('--report', default=None, help='write the full run report as JSON to this path')
+    return parser
+
+
+def format_stats(deal: str, property_type: str, report: dict) -> str:
+    stats = report['stats']
+    return (f"{deal}/{property_type}: {stats['units_done']} units, {stats['pages_done']} pages, "
+            f"{stats['errors']} errors in {report['duration']}s ({stats['units_per_second']} units/s)")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = make_parser()
+    args = parser.parse_args(argv)
+    crawl_all = args.stop == 'all'
+    if not crawl_all and (not args.stop.isdigit() or int(args.stop) <= args.start):
+        parser.error('--stop must be greater than --start, or "all"')
+
+    reports = {}
+    units = errors = 0
+    try:
+        for deal in args.deals:
+            builder = MultiBuilder(
+                args.types, args.start, None if crawl_all else int(args.stop), deal, args.output_dir, args.output_format,
+                use_async=args.use_async, parse_workers=args.parse_workers, cache_backend=args.cache_backend,
+                incremental=args.incremental, stop_known_ratio=args.stop_known_ratio,
+                max_concurrency=args.concurrency, crawl_all=crawl_all, dedup=args.dedup,
+                seen_size=args.seen_size
+            )
+            runner = builder.build()
+            runner.run()
+            reports[deal] = runner.report()
+            for property_type, report in reports[deal]['runs'].items():
+                print(format_stats(deal, property_type, report))
+                units += report['stats']['units_done']
+                errors += report['stats']['errors']
+    except KeyboardInterrupt:
+        print('[Interrupted]', file=sys.stderr)
+        return EXIT_INTERRUPTED
+    except Exception as e:
+        print(f"[Error running crawl] {e}", file=sys.stderr)
+        return EXIT_FAILED
+    finally:
+        if args.report and reports:
+            Path(args.report).write_text(json.dumps(reports, ensure_ascii=False, indent=2), encoding='utf-8')
+
+    print(f'total: {units} units, {errors} errors')
+    if not units and (errors or not args.incremental):
+        return EXIT_FAILED
+    return EXIT_PARTIAL if errors else EXIT_OK
+
+
+if __name__ == '__main__':
+    sys.exit(main())
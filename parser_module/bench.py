@@ -0,0 +1,340 @@
+# bench.py
+import argparse
+import json
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import requests
+import requests.adapters
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit
+from parser_module.cache import make_cache
+from parser_module.config import Config
+from parser_module.main import Builder
+from parser_module.utils import FileManager, make_process_pool, parse_in_worker
+
+
+class OfflineAdapter(requests.adapters.BaseAdapter):
+    def send(self, request, **kwargs):
+        raise requests.ConnectionError(f'offline: {request.url} is not in the corpus')
+
+    def close(self):
+        pass
+
+
+def offline_session() -> requests.Session:
+    offline = requests.Session()
+    offline.mount('http://', OfflineAdapter())
+    offline.mount('https://', OfflineAdapter())
+    return offline
+
+
+def url_path(url: str) -> str:
+    parts = urlsplit(url)
+    return parts.path + (f'?{parts.query}' if parts.query else '')
+
+
+class ReplayServer:
+    def __init__(self, corpus: dict, host: str = '127.0.0.1', port: int = 0):
+        pages = {url_path(url): text.encode('utf-8') for url, text in corpus.items()}
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                body = pages.get(self.path)
+                if body is None:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.url = f'http://{host}:{self.server.server_address[1]}'
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def load_corpus(cache_dir: str = 'cache', cache_backend: str = 'sqlite') -> dict:
+    items = make_cache(cache_backend, Path(cache_dir)).items()
+    return {url or f'file-{i}': text for i, (url, text) in enumerate(items)}
+
+
+def split_corpus(corpus: dict, parser) -> tuple[dict, dict]:
+    listings, details = {}, {}
+    for url, text in corpus.items():
+        if 'page=' in url or parser.collect_units_from_html(text):
+            listings[url] = text
+        else:
+            details[url] = text
+    return listings, details
+
+
+def summarize(latencies: list[float], elapsed: float, errors: int = 0) -> dict:
+    count = len(latencies)
+    ordered = sorted(latencies)
+    return {
+        'count': count,
+        'errors': errors,
+        'seconds': round(elapsed, 4),
+        'per_second': round(count / elapsed, 2) if elapsed else None,
+        'p50_ms': round(statistics.median(ordered) * 1000, 3) if ordered else None,
+        'p95_ms': round(ordered[min(count - 1, int(0.95 * count))] * 1000, 3) if ordered else None,
+    }
+
+
+def time_calls(func, pages: dict, repeat: int) -> dict:
+    latencies, errors = [], 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for url, text in pages.items():
+            call_start = time.perf_counter()
+            try:
+                func(text, url)
+            except Exception:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - call_start)
+    return summarize(latencies, time.perf_counter() - start, errors)
+
+
+def bench_collect_units(parser, listings: dict, backends: list[str], repeat: int) -> dict:
+    results = {}
+    for backend in backends:
+        parser.backend = backend
+        results[backend] = time_calls(lambda text, url: parser.collect_units_from_html(text), listings, repeat)
+    return results
+
+
+def bench_parse(parser, details: dict, backends: list[str], workers: list[int], repeat: int) -> dict:
+    results = {}
+    for backend in backends:
+        parser.backend = backend
+        for count in workers:
+            key = f'{backend}/workers={count}'
+            if count == 0:
+                results[key] = time_calls(parser.parse_html, details, repeat)
+                continue
+
+            texts = list(details.values()) * repeat
+            urls = list(details) * repeat
+            base_url = parser.config.base_url
+            with make_process_pool(count) as pool:
+                list(pool.map(parse_in_worker, [type(parser)] * count, [backend] * count, [base_url] * count, ['parse_html'] * count,
+                              texts[:count], urls[:count]))
+                start = time.perf_counter()
+                parsed = list(pool.map(parse_in_worker, [type(parser)] * len(texts), [backend] * len(texts), [base_url] * len(texts),
+                                       ['parse_html'] * len(texts), texts, urls, chunksize=16))
+                elapsed = time.perf_counter() - start
+            results[key] = {
+                'count': len(parsed),
+                'errors': 0,
+                'seconds': round(elapsed, 4),
+                'per_second': round(len(parsed) / elapsed, 2) if elapsed else None,
+            }
+    return results
+
+
+def bench_writes(parser, details: dict, property_type: str, formats: list[str], rows: int) -> dict:
+    records = [parser.parse_html(text, url) for url, text in details.items()]
+    if not records:
+        return {}
+
+    results = {}
+    columns = parser.config.get_columns()
+    for output_format in formats:
+        with tempfile.TemporaryDirectory() as tmp:
+            name = 'listings.csv' if output_format == 'csv' else 'listings'
+            filemanager = FileManager('sale', property_type, columns, str(Path(tmp) / name), output_format)
+            start = time.perf_counter()
+            for i in range(rows):
+                filemanager.add(records[i % len(records)])
+            filemanager.close()
+            elapsed = time.perf_counter() - start
+        results[output_format] = {
+            'rows': rows,
+            'seconds': round(elapsed, 4),
+            'rows_per_second': round(rows / elapsed, 2) if elapsed else None,
+        }
+    return results
+
+
+def run_once(corpus: dict, builder: Builder, cache_dir: Path, mode: str) -> dict:
+    runner = builder.build()
+    runner.parser.cache_dir = cache_dir
+    runner.parser.set_cache_backend('sqlite')
+    if mode == 'cache':
+        for url, text in corpus.items():
+            runner.parser.cache.put(url, text)
+        runner.parser.cache_lifetime = float('inf')
+        runner.parser.cache_retention = float('inf')
+        runner.parser.session = offline_session()
+
+    runner.run()
+    return runner.report()
+
+
+def bench_runner(corpus: dict, property_type: str, deal: str, start_page: int, stop_page: int, mode: str,
+                 concurrency: list[int], parse_workers: list[int], use_async: bool = False) -> dict:
+    results = {}
+    listing_url = next((url for url in corpus if 'page=' in url), None)
+    if listing_url is None:
+        return results
+
+    parts = urlsplit(listing_url)
+    corpus_base = f'{parts.scheme}://{parts.netloc}'
+    for max_concurrency in concurrency:
+        for workers in parse_workers:
+            base_url = Config.base_url
+            with tempfile.TemporaryDirectory() as tmp, (ReplayServer(corpus) if mode == 'replay' else nullcontext()) as server:
+                Config.base_url = server.url if server else corpus_base
+                try:
+                    report = run_once(corpus, Builder(property_type, start_page, stop_page, deal, str(Path(tmp) / 'out.csv'),
+                                                      use_async=use_async, parse_workers=workers, max_concurrency=max_concurrency),
+                                      Path(tmp) / 'cache', mode)
+                finally:
+                    Config.base_url = base_url
+
+            key = f'{mode}/{"async" if use_async else "sync"}/concurrency={max_concurrency}/workers={workers}'
+            results[key] = {
+                'seconds': report['duration'],
+                'units': report['stats']['units_done'],
+                'pages': report['stats']['pages_done'],
+                'errors': report['stats']['errors'],
+                'units_per_second': round(report['stats']['units_done'] / report['duration'], 2) if report['duration'] else None,
+                'stages': report['metrics']['stages'],
+            }
+    return results
+
+
+IMPORT_BUDGETS_MS = {
+    'parser_module.config': 50,
+    'parser_module.utils': 150,
+    'parser_module.main': 200,
+}
+
+
+def bench_imports(budgets: dict = IMPORT_BUDGETS_MS, repeat: int = 3) -> dict:
+    results = {}
+    for module, budget in budgets.items():
+        code = f'import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)'
+        timings = [float(subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout)
+                   for _ in range(repeat)]
+        best = round(min(timings) * 1000, 1)
+        results[module] = {'ms': best, 'budget_ms': budget, 'ok': best <= budget}
+    return results
+
+
+def run_suite(cache_dir: str, cache_backend: str, property_type: str, deal: str, start_page: int, stop_page: int,
+              modes: list[str], backends: list[str], workers: list[int], concurrency: list[int],
+              formats: list[str], rows: int, repeat: int) -> dict:
+    corpus = load_corpus(cache_dir, cache_backend)
+    parser = Config.get_parser_types()[property_type]()
+    listings, details = split_corpus(corpus, parser)
+
+    results = {
+        'meta': {
+            'timestamp': time.time(),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'property_type': property_type,
+            'listing_pages': len(listings),
+            'detail_pages': len(details),
+        },
+        'collect_units': bench_collect_units(parser, listings, backends, repeat),
+        'parse': bench_parse(parser, details, backends, workers, repeat),
+        'write': bench_writes(parser, details, property_type, formats, rows),
+        'runner': {},
+        'imports': bench_imports(),
+    }
+    parser.backend = 'lxml'
+    for mode in modes:
+        results['runner'].update(bench_runner(corpus, property_type, deal, start_page, stop_page, mode, concurrency, workers))
+        if mode == 'replay':
+            results['runner'].update(bench_runner(corpus, property_type, deal, start_page, stop_page, mode, concurrency, workers, use_async=True))
+    return results
+
+
+def compare(baseline: dict, current: dict, threshold: float = 0.1) -> list[str]:
+    lines = []
+    for section in ('collect_units', 'parse', 'write', 'runner'):
+        for key, stats in current.get(section, {}).items():
+            old = baseline.get(section, {}).get(key)
+            if not old:
+                continue
+            for metric in ('per_second', 'rows_per_second', 'units_per_second'):
+                if stats.get(metric) and old.get(metric):
+                    change = stats[metric] / old[metric] - 1
+                    flag = 'REGRESSION' if change < -threshold else 'ok'
+                    lines.append(f'{flag:<10} {section}/{key} {metric}: {old[metric]} -> {stats[metric]} ({change:+.1%})')
+    return lines
+
+
+def int_list(value: str) -> list[int]:
+    return [int(item) for item in value.split(',')]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Offline benchmarks over a recorded house.kg page corpus')
+    parser.add_argument('cache_dir', nargs='?', default='cache')
+    parser.add_argument('--cache-backend', default='sqlite', choices=['sqlite', 'file'])
+    parser.add_argument('--type', default='sector')
+    parser.add_argument('--deal', default='sale')
+    parser.add_argument('--start', type=int, default=1)
+    parser.add_argument('--stop', type=int, default=2)
+    parser.add_argument('--modes', default='cache,replay')
+    parser.add_argument('--backends', default='bs4,lxml')
+    parser.add_argument('--workers', type=int_list, default=[0, 2, 4])
+    parser.add_argument('--concurrency', type=int_list, default=[1, 10])
+    parser.add_argument('--formats', default='csv,parquet')
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default=None)
+    parser.add_argument('--baseline', default=None)
+    parser.add_argument('--imports', action='store_true')
+    args = parser.parse_args()
+
+    if args.imports:
+        imports = bench_imports()
+        print(json.dumps(imports, indent=2))
+        sys.exit(0 if all(result['ok'] for result in imports.values()) else 1)
+
+    if args.cache_backend == 'file':
+        args.modes = ''
+    work_dir = tempfile.mkdtemp()
+    try:
+        corpus_dir = shutil.copytree(args.cache_dir, Path(work_dir) / 'corpus')
+        results = run_suite(str(corpus_dir), args.cache_backend, args.type, args.deal, args.start, args.stop,
+                            [mode for mode in args.modes.split(',') if mode], args.backends.split(','), args.workers,
+                            args.concurrency, args.formats.split(','), args.rows, args.repeat)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    text = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(text, encoding='utf-8')
+    else:
+        print(text)
+    if args.baseline:
+        for line in compare(json.loads(Path(args.baseline).read_text(encoding='utf-8')), results):
+            print(line)
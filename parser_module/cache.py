@@ -0,0 +1,162 @@
+# cache.py
+import gzip
+import hashlib
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+@dataclass
+class CacheEntry:
+    text: str
+    fetched_at: float
+    etag: str | None = None
+    last_modified: str | None = None
+
+
+def url_key(url: str) -> str:
+    return hashlib.md5(url.encode()).hexdigest()
+
+
+class FileCache:
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def path(self, url: str) -> Path:
+        return self.cache_dir / f'{url_key(url)}.html'
+
+    def get(self, url: str, max_age: float | None = None) -> CacheEntry | None:
+        html_path = self.path(url)
+        if not html_path.exists():
+            return None
+        fetched_at = html_path.stat().st_mtime
+        if max_age is not None and time.time() - fetched_at >= max_age:
+            return None
+        return CacheEntry(html_path.read_text(encoding='utf-8'), fetched_at)
+
+    def put(self, url: str, text: str, etag: str | None = None, last_modified: str | None = None) -> None:
+        self.path(url).write_text(text, encoding='utf-8')
+
+    def touch(self, url: str) -> None:
+        self.path(url).touch()
+
+    def items(self):
+        for file in self.cache_dir.glob('*.html'):
+            yield None, file.read_text(encoding='utf-8')
+
+    def expire(self, max_age: float) -> None:
+        now = time.time()
+        for file in self.cache_dir.glob('*.html'):
+            if now - file.stat().st_mtime > max_age:
+                file.unlink()
+
+
+class SQLiteCache:
+    def __init__(self, cache_dir: Path, shards: int = 8, level: int = 3):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.shards = shards
+        self.level = level
+        self.codec = 'zstd' if zstandard else 'gzip'
+        self.local = threading.local()
+
+    def connect(self, shard: int) -> sqlite3.Connection:
+        connections = getattr(self.local, 'connections', None)
+        if connections is None:
+            connections = self.local.connections = {}
+
+        conn = connections.get(shard)
+        if conn is None:
+            conn = sqlite3.connect(self.cache_dir / f'pages_{shard:02d}.sqlite', timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS pages ('
+                'key TEXT PRIMARY KEY, url TEXT, fetched_at REAL, size INTEGER, '
+                'etag TEXT, last_modified TEXT, codec TEXT, body BLOB)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS pages_fetched_at ON pages (fetched_at)')
+            conn.commit()
+            connections[shard] = conn
+        return conn
+
+    def shard_of(self, key: str) -> int:
+        return int(key[:4], 16) % self.shards
+
+    def compress(self, text: str) -> bytes:
+        data = text.encode('utf-8')
+        if self.codec == 'zstd':
+            return zstandard.ZstdCompressor(level=self.level).compress(data)
+        return gzip.compress(data, compresslevel=self.level)
+
+    def decompress(self, codec: str, body: bytes) -> str:
+        if codec == 'zstd':
+            data = zstandard.ZstdDecompressor().decompress(body)
+        else:
+            data = gzip.decompress(body)
+        return data.decode('utf-8')
+
+    def get(self, url: str, max_age: float | None = None) -> CacheEntry | None:
+        key = url_key(url)
+        conn = self.connect(self.shard_of(key))
+        if max_age is None:
+            row = conn.execute(
+                'SELECT fetched_at, etag, last_modified, codec, body FROM pages WHERE key = ?', (key,)
+            ).fetchone()
+        else:
+            row = conn.execute(
+                'SELECT fetched_at, etag, last_modified, codec, body FROM pages WHERE key = ? AND fetched_at > ?',
+                (key, time.time() - max_age)
+            ).fetchone()
+        if row is None:
+            return None
+
+        fetched_at, etag, last_modified, codec, body = row
+        return CacheEntry(self.decompress(codec, body), fetched_at, etag, last_modified)
+
+    def put(self, url: str, text: str, etag: str | None = None, last_modified: str | None = None) -> None:
+        key = url_key(url)
+        body = self.compress(text)
+        conn = self.connect(self.shard_of(key))
+        conn.execute(
+            'INSERT OR REPLACE INTO pages (key, url, fetched_at, size, etag, last_modified, codec, body) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (key, url, time.time(), len(body), etag, last_modified, self.codec, body)
+        )
+        conn.commit()
+
+    def touch(self, url: str) -> None:
+        key = url_key(url)
+        conn = self.connect(self.shard_of(key))
+        conn.execute('UPDATE pages SET fetched_at = ? WHERE key = ?', (time.time(), key))
+        conn.commit()
+
+    def items(self):
+        for shard in range(self.shards):
+            for url, codec, body in self.connect(shard).execute('SELECT url, codec, body FROM pages'):
+                yield url, self.decompress(codec, body)
+
+    def expire(self, max_age: float) -> None:
+        cutoff = time.time() - max_age
+        for shard in range(self.shards):
+            conn = self.connect(shard)
+            conn.execute('DELETE FROM pages WHERE fetched_at < ?', (cutoff,))
+            conn.commit()
+
+
+CACHE_BACKENDS = {
+    'file': FileCache,
+    'sqlite': SQLiteCache,
+}
+
+
+def make_cache(backend: str, cache_dir: Path):
+    return CACHE_BACKENDS[backend](cache_dir)
@@ -1,7 +1,6 @@
 # config.py
 from enum import Enum
 from pathlib import Path
-import fake_useragent
 from dataclasses import dataclass, field
 from typing import Dict, List
 
@@ -10,14 +9,14 @@ from typing import Dict, List
 class Config:
     base_url = 'https://house.kg'
     headers = {
-        'User-Agent': fake_useragent.UserAgent().random,
         'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
         'connection': 'keep-alive',
         'accept-encoding': 'gzip, deflate',
-        'host': 'www.house.kg',
         'Referer': 'https://house.kg'
     }
     main_path = Path().absolute()
+    max_pages = 10000
+    units_per_page = 20
 
     const_target_dict = {
         'Название': [],
@@ -42,78 +41,121 @@ class Config:
         'parking_and_garage': 'parking-garaj'
     }
     
+    def get_columns(self) -> List[str]:
+        return ['URL'] + list(self.const_target_dict.keys()) + list(self.target_dict.keys())
+
     @staticmethod
     def get_parser_types():
-        from parser_module.parsers import SectorParser, PrivateHouseParser, ApartmentParser
-        return {
-                'private_house': PrivateHouseParser,
-                'sector': SectorParser,
-                'apartment': ApartmentParser
-            }
+        from parser_module.parsers import PARSERS
+        return PARSERS
     
+DEAL_FIELDS = [
+    'Правоустанавливающие документы',
+    'Возможность рассрочки',
+    'Возможность ипотеки',
+    'Возможность обмена',
+]
+
+HOUSING_FIELDS = [
+    'Тип предложения',
+    'Дом',
+    'Кол-во этажей',
+    'Площадь',
+    'Площадь участка',
+    'Отопление',
+    'Состояние',
+    'Телефон',
+    'Интернет',
+    'Санузел',
+    'Канализация',
+    'Питьевая вода',
+    'Электричество',
+    'Газ',
+    'Мебель',
+    'Пол',
+    'Безопасность',
+    'Высота потолков',
+    *DEAL_FIELDS,
+    'Разное',
+    'Серия',
+    'Входная дверь',
+    'Местоположение',
+    'Коммуникации',
+    'Парковка',
+]
+
+
 @dataclass
 class SectorConfig(Config):
-    target_dict = {
-        'Тип предложения':'',
-        'Площадь участка': '',
-        'Местоположение': '',
-        'Коммуникации': '',
-        'Разное': '',
-        'Правоустанавливающие документы': '',
-        'Возможность рассрочки': '',
-        'Возможность ипотеки': '',
-        'Возможность обмена': ''
-    }
+    target_dict = dict.fromkeys([
+        'Тип предложения',
+        'Площадь участка',
+        'Местоположение',
+        'Коммуникации',
+        'Разное',
+        *DEAL_FIELDS,
+    ], '')
+
 
 class PrivateHouseConfig(Config):
-    target_dict = {
-        'Тип предложения': '',
-        'Дом': '',
-        'Кол-во этажей': '',
-        'Площадь': '',
-        'Площадь участка': '',
-        'Отопление': '',
-        'Состояние': '',
-        'Телефон': '',
-        'Интернет': '',
-        'Санузел': '',
-        'Канализация': '',
-        'Питьевая вода': '',
-        'Электричество': '',
-        'Газ': '',
-        'Мебель': '',
-        'Пол': '',
-        'Безопасность': '',
-        'Высота потолков': '',
-        'Правоустанавливающие документы': '',
-        'Возможность рассрочки': '',
-        'Возможность ипотеки': '',
-        'Возможность обмена': ''
-    }
+    target_dict = dict.fromkeys(HOUSING_FIELDS, '')
 
 
 class ApartmentConfig(Config):
-    target_dict = {
-        'Тип предложения': '',
-        'Дом': '',
-        'Кол-во этажей': '',
-        'Площадь': '',
-        'Площадь участка': '',
-        'Отопление': '',
-        'Состояние': '',
-        'Телефон': '',
-        'Интернет': '',
-        'Санузел': '',
-        'Канализация': '',
-        'Питьевая вода': '',
-        'Электричество': '',
-        'Газ': '',
-        'Мебель': '',
-        'Пол': '',
-        'Безопасность': '',
-        'Высота потолков': '',
-        'Правоустанавливающие документы': '',
-        'Возможность рассрочки': '',
-        'Возможность ипотеки': '',
-        'Возможность обмена': ''
-    }
+    target_dict = dict.fromkeys(HOUSING_FIELDS, '')
+
+
+class RoomConfig(Config):
+    target_dict = dict.fromkeys(HOUSING_FIELDS, '')
+
+
+class CountryHouseConfig(Config):
+    target_dict = dict.fromkeys(HOUSING_FIELDS, '')
+
+
+class CommercialPropertyConfig(Config):
+    target_dict = dict.fromkeys([
+        'Тип предложения',
+        'Тип объекта',
+        'Площадь',
+        'Площадь участка',
+        'Этаж',
+        'Кол-во этажей',
+        'Состояние',
+        'Отопление',
+        'Санузел',
+        'Канализация',
+        'Питьевая вода',
+        'Электричество',
+        'Газ',
+        'Безопасность',
+        'Высота потолков',
+        *DEAL_FIELDS,
+        'Разное',
+        'Местоположение',
+        'Коммуникации',
+        'Парковка',
+    ], '')
+
+
+class ParkingAndGarageConfig(Config):
+    target_dict = dict.fromkeys([
+        'Тип предложения',
+        'Тип',
+        'Площадь',
+        'Безопасность',
+        *DEAL_FIELDS,
+        'Разное',
+        'Местоположение',
+    ], '')
+
+
+SCHEMAS = {
+    'apartment': ApartmentConfig,
+    'private_house': PrivateHouseConfig,
+    'commercial_property': CommercialPropertyConfig,
+    'room': RoomConfig,
+    'sector': SectorConfig,
+    'country_house': CountryHouseConfig,
+    'parking_and_garage': ParkingAndGarageConfig,
+}
@@ -0,0 +1,143 @@
+# dedup.py
+import asyncio
+import hashlib
+import math
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from parser_module.metrics import Metrics, metrics
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+TRACKING_PARAMS = ('utm_', 'fbclid', 'gclid', 'yclid', '_openstat')
+
+
+def normalize_url(url: str) -> str:
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc.lower()
+    if parts.port is not None and parts.port == DEFAULT_PORTS.get(scheme):
+        netloc = netloc.rsplit(':', 1)[0]
+    params = sorted((key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+                    if not key.lower().startswith(TRACKING_PARAMS))
+    return urlunsplit((scheme, netloc, parts.path or '/', urlencode(params), ''))
+
+
+class SeenSet:
+    def __init__(self, size: int = 100_000):
+        self.size = size
+        self.keys = OrderedDict()
+        self.lock = threading.Lock()
+
+    def add(self, key: str) -> bool:
+        with self.lock:
+            if key in self.keys:
+                self.keys.move_to_end(key)
+                return False
+            self.keys[key] = None
+            if self.size and len(self.keys) > self.size:
+                self.keys.popitem(last=False)
+            return True
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+
+class BloomLayer:
+    def __init__(self, size: int, error_rate: float):
+        self.size = size
+        self.bit_count = max(64, int(-size * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.bit_count / size * math.log(2)))
+        self.bits = bytearray((self.bit_count + 7) // 8)
+        self.count = 0
+
+    def positions(self, key: str) -> list[int]:
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        step = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * step) % self.bit_count for i in range(self.hash_count)]
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.positions(key))
+
+    def add(self, key: str) -> bool:
+        added = False
+        for position in self.positions(key):
+            index, mask = position >> 3, 1 << (position & 7)
+            if not self.bits[index] & mask:
+                self.bits[index] |= mask
+                added = True
+        self.count += added
+        return added
+
+
+class BloomFilter:
+    def __init__(self, size: int = 1_000_000, error_rate: float = 0.001):
+        self.error_rate = error_rate
+        self.layers = [BloomLayer(size, error_rate)]
+        self.lock = threading.Lock()
+
+    def add(self, key: str) -> bool:
+        with self.lock:
+            if any(key in layer for layer in self.layers[:-1]):
+                return False
+            layer = self.layers[-1]
+            if layer.count >= layer.size:
+                print(f"[Bloom filter reached {layer.size} keys, adding a layer of {layer.size * 2}]")
+                layer = BloomLayer(layer.size * 2, self.error_rate)
+                self.layers.append(layer)
+            return layer.add(key)
+
+    def __len__(self) -> int:
+        return sum(layer.count for layer in self.layers)
+
+
+SEEN = {'set': SeenSet, 'bloom': BloomFilter}
+
+
+def make_seen(kind: str = 'set', size: int = 100_000):
+    return SEEN[kind](max(size, 1000))
+
+
+class Coalescer:
+    def __init__(self, registry: Metrics = metrics):
+        self.metrics = registry
+        self.pending = {}
+        self.lock = threading.Lock()
+
+    def run(self, key: str, func, *args):
+        with self.lock:
+            future = self.pending.get(key)
+            leader = future is None
+            if leader:
+                future = self.pending[key] = Future()
+        if not leader:
+            self.metrics.inc('requests_coalesced')
+            return future.result()
+
+        try:
+            result = func(*args)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self.lock:
+                self.pending.pop(key, None)
+
+
+class AsyncCoalescer:
+    def __init__(self, registry: Metrics = metrics):
+        self.metrics = registry
+        self.pending = {}
+
+    async def run(self, key: str, func, *args):
+        task = self.pending.get(key)
+        if task is None:
+            task = self.pending[key] = asyncio.ensure_future(func(*args))
+            task.add_done_callback(lambda _: self.pending.pop(key, None))
+        else:
+            self.metrics.inc('requests_coalesced')
+        return await asyncio.shield(task)
@@ -0,0 +1,250 @@
+# distributed.py
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from parser_module.config import Config
+from parser_module.dedup import normalize_url
+from parser_module.main import Builder
+from parser_module.writers import WRITERS
+
+
+class WorkQueue:
+    def __init__(self, path: str = 'queue.sqlite', lease: float = 120.0):
+        self.path = Path(path)
+        self.lease = lease
+        self.local = threading.local()
+        conn = self.connect()
+        conn.executescript(
+            'CREATE TABLE IF NOT EXISTS tasks ('
+            'id INTEGER PRIMARY KEY, kind TEXT, deal TEXT, property_type TEXT, url TEXT, status TEXT, '
+            'worker TEXT, leased_until REAL DEFAULT 0, attempts INTEGER DEFAULT 0, error TEXT, '
+            'UNIQUE (kind, deal, property_type, url));'
+            'CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, leased_until);'
+            'CREATE TABLE IF NOT EXISTS results ('
+            'id INTEGER PRIMARY KEY, deal TEXT, property_type TEXT, url TEXT, payload TEXT, '
+            'UNIQUE (deal, property_type, url));'
+        )
+        conn.commit()
+
+    def connect(self) -> sqlite3.Connection:
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self.local.conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def add_tasks(self, kind: str, deal: str, property_type: str, urls: list[str]) -> None:
+        conn = self.connect()
+        conn.execute('BEGIN IMMEDIATE')
+        conn.executemany(
+            "INSERT OR IGNORE INTO tasks (kind, deal, property_type, url, status) VALUES (?, ?, ?, ?, 'pending')",
+            [(kind, deal, property_type, url) for url in urls]
+        )
+        conn.execute('COMMIT')
+
+    def claim(self, worker: str) -> tuple | None:
+        conn = self.connect()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        row = conn.execute(
+            "SELECT id, kind, deal, property_type, url, attempts FROM tasks "
+            "WHERE status = 'pending' OR (status = 'leased' AND leased_until < ?) "
+            "ORDER BY kind = 'unit' DESC, id LIMIT 1",
+            (now,)
+        ).fetchone()
+        if row is not None:
+            conn.execute(
+                "UPDATE tasks SET status = 'leased', worker = ?, leased_until = ? WHERE id = ?",
+                (worker, now + self.lease, row[0])
+            )
+        conn.execute('COMMIT')
+        return row
+
+    def complete_page(self, task_id: int, deal: str, property_type: str, units: list[str]) -> None:
+        conn = self.connect()
+        conn.execute('BEGIN IMMEDIATE')
+        conn.executemany(
+            "INSERT OR IGNORE INTO tasks (kind, deal, property_type, url, status) VALUES ('unit', ?, ?, ?, 'pending')",
+            [(deal, property_type, normalize_url(unit)) for unit in units]
+        )
+        conn.execute("UPDATE tasks SET status = 'done' WHERE id = ?", (task_id,))
+        conn.execute('COMMIT')
+
+    def complete_unit(self, task_id: int, deal: str, property_type: str, url: str, values: list) -> None:
+        conn = self.connect()
+        conn.execute('BEGIN IMMEDIATE')
+        conn.execute(
+            'INSERT OR IGNORE INTO results (deal, property_type, url, payload) VALUES (?, ?, ?, ?)',
+            (deal, property_type, url, json.dumps(values, ensure_ascii=False))
+        )
+        conn.execute("UPDATE tasks SET status = 'done' WHERE id = ?", (task_id,))
+        conn.execute('COMMIT')
+
+    def fail(self, task_id: int, attempts: int, error: str, max_attempts: int) -> None:
+        status = 'failed' if attempts + 1 >= max_attempts else 'pending'
+        self.connect().execute(
+            'UPDATE tasks SET status = ?, attempts = ?, error = ?, worker = NULL WHERE id = ?',
+            (status, attempts + 1, error, task_id)
+        )
+
+    def take_results(self, limit: int = 1000) -> list[tuple]:
+        conn = self.connect()
+        conn.execute('BEGIN IMMEDIATE')
+        rows = conn.execute('SELECT id, deal, property_type, url, payload FROM results LIMIT ?', (limit,)).fetchall()
+        conn.executemany('DELETE FROM results WHERE id = ?', [(row[0],) for row in rows])
+        conn.execute('COMMIT')
+        return rows
+
+    def lease_deadline(self) -> float:
+        row = self.connect().execute("SELECT MAX(leased_until) FROM tasks WHERE status = 'leased'").fetchone()
+        return row[0] or 0.0
+
+    def open_tasks(self) -> int:
+        row = self.connect().execute("SELECT COUNT(*) FROM tasks WHERE status IN ('pending', 'leased')").fetchone()
+        return row[0]
+
+    def summary(self) -> dict:
+        rows = self.connect().execute('SELECT kind, status, COUNT(*) FROM tasks GROUP BY kind, status')
+        return {f'{kind}_{status}': count for kind, status, count in rows}
+
+
+class Coordinator:
+    def __init__(self, queue: WorkQueue, output_dir: str | None = None, output_format: str = 'csv'):
+        self.queue = queue
+        self.output_dir = output_dir
+        self.output_format = output_format
+        self.runners = {}
+
+    def runner_for(self, deal: str, property_type: str):
+        key = (deal, property_type)
+        runner = self.runners.get(key)
+        if runner is None:
+            output_path = None
+            if self.output_dir:
+                name = WRITERS[self.output_format].default_name.format(deal=deal, property_type=property_type)
+                output_path = str(Path(self.output_dir) / name)
+            runner = self.runners[key] = Builder(property_type, 1, 1, deal, output_path, output_format=self.output_format).build()
+        return runner
+
+    def shard(self, property_types: list[str], deals: list[str], start_page: int, stop_page: int) -> None:
+        for deal in deals:
+            for property_type in property_types:
+                pattern_url = Builder(property_type, start_page, stop_page, deal).get_pattern_url()
+                urls = [pattern_url + str(page) for page in range(start_page, stop_page)]
+                self.queue.add_tasks('page', deal, property_type, urls)
+
+    def collect(self, poll_interval: float = 1.0, idle_timeout: float | None = None) -> dict:
+        idle_timeout = idle_timeout if idle_timeout is not None else self.queue.lease * 3
+        written = 0
+        progress = (None, time.time())
+        try:
+            while True:
+                open_tasks = self.queue.open_tasks()
+                rows = self.queue.take_results()
+                if rows or open_tasks != progress[0]:
+                    progress = (open_tasks, time.time())
+                elif time.time() - progress[1] > idle_timeout:
+                    print(f"[Stopping collect] no progress for {idle_timeout}s with {open_tasks} open tasks")
+                    break
+                for _, deal, property_type, url, payload in rows:
+                    runner = self.runner_for(deal, property_type)
+                    filemanager = runner.filemanager
+                    if url in filemanager.existing_urls:
+                        continue
+                    record = runner.parser.new_record()
+                    record.values = json.loads(payload)
+                    filemanager.add(record)
+                    filemanager.existing_urls.add(url)
+                    written += 1
+                if not rows:
+                    if open_tasks == 0:
+                        break
+                    time.sleep(poll_interval)
+        finally:
+            for runner in self.runners.values():
+                runner.filemanager.close()
+            self.runners = {}
+
+        return {'written': written, **self.queue.summary()}
+
+
+class Worker:
+    def __init__(self, queue: WorkQueue, threads: int = 10, max_attempts: int = 3, idle_timeout: float = 10.0):
+        self.queue = queue
+        self.threads = threads
+        self.max_attempts = max_attempts
+        self.idle_timeout = idle_timeout
+        self.name = f'{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}'
+        self.parsers = {}
+        self.lock = threading.Lock()
+
+    def parser_for(self, property_type: str):
+        with self.lock:
+            parser = self.parsers.get(property_type)
+            if parser is None:
+                parser = self.parsers[property_type] = Config.get_parser_types()[property_type]()
+            return parser
+
+    def execute(self, task: tuple) -> None:
+        task_id, kind, deal, property_type, url, attempts = task
+        parser = self.parser_for(property_type)
+        try:
+            if kind == 'page':
+                self.queue.complete_page(task_id, deal, property_type, parser.collect_units(url))
+            else:
+                self.queue.complete_unit(task_id, deal, property_type, url, parser.parse(url).values)
+        except Exception as e:
+            print(f"[Error in {kind} task] {url}: {e}")
+            self.queue.fail(task_id, attempts, str(e), self.max_attempts)
+
+    def work(self) -> None:
+        idle_since = None
+        while True:
+            task = self.queue.claim(self.name)
+            if task is not None:
+                idle_since = None
+                self.execute(task)
+                continue
+            if self.queue.open_tasks() == 0:
+                return
+            idle_since = idle_since or time.time()
+            if time.time() - idle_since > self.idle_timeout and time.time() > self.queue.lease_deadline():
+                return
+            time.sleep(0.5)
+
+    def run(self) -> None:
+        workers = [threading.Thread(target=self.work) for _ in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Distributed house.kg crawl over a shared SQLite work queue')
+    parser.add_argument('role', choices=['coordinator', 'worker'])
+    parser.add_argument('--queue', default='queue.sqlite')
+    parser.add_argument('--types', default='sector,private_house')
+    parser.add_argument('--deals', default='sale')
+    parser.add_argument('--start', type=int, default=1)
+    parser.add_argument('--stop', type=int, default=2)
+    parser.add_argument('--output-dir', default=None)
+    parser.add_argument('--output-format', default='csv', choices=list(WRITERS))
+    parser.add_argument('--threads', type=int, default=10)
+    parser.add_argument('--lease', type=float, default=120.0)
+    parser.add_argument('--idle-timeout', type=float, default=None, help='coordinator: give up after this long without progress')
+    args = parser.parse_args()
+
+    work_queue = WorkQueue(args.queue, args.lease)
+    if args.role == 'coordinator':
+        coordinator = Coordinator(work_queue, args.output_dir, args.output_format)
+        coordinator.shard(args.types.split(','), args.deals.split(','), args.start, args.stop)
+        print(coordinator.collect(idle_timeout=args.idle_timeout))
+    else:
+        Worker(work_queue, args.threads).run()
@@ -0,0 +1,204 @@
+# history.py
+import argparse
+import hashlib
+import json
+import sqlite3
+import time
+from datetime import date, datetime
+from pathlib import Path
+from parser_module.lazy import lazy_import
+from parser_module.transform import typed_columns
+
+pd = lazy_import('pandas')
+
+
+def to_timestamp(value) -> float:
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day).timestamp()
+    raise TypeError(f'Unsupported timestamp: {value!r}')
+
+
+def content_hash(values: list) -> str:
+    return hashlib.blake2b(json.dumps(values, ensure_ascii=False).encode('utf-8'), digest_size=16).hexdigest()
+
+
+class ListingHistory:
+    def __init__(self, path: str = 'history.sqlite'):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(
+            'CREATE TABLE IF NOT EXISTS runs ('
+            'id INTEGER PRIMARY KEY, deal TEXT, property_type TEXT, started_at REAL, finished_at REAL, full INTEGER DEFAULT 0);'
+            'CREATE TABLE IF NOT EXISTS listings ('
+            'url TEXT PRIMARY KEY, deal TEXT, property_type TEXT, hash TEXT, price REAL, '
+            'first_seen REAL, last_seen REAL, last_changed REAL);'
+            'CREATE TABLE IF NOT EXISTS versions ('
+            'id INTEGER PRIMARY KEY, url TEXT, scraped_at REAL, hash TEXT, price REAL, payload TEXT);'
+            'CREATE INDEX IF NOT EXISTS versions_url ON versions (url, scraped_at);'
+            'CREATE INDEX IF NOT EXISTS versions_scraped_at ON versions (scraped_at);'
+            'CREATE INDEX IF NOT EXISTS listings_first_seen ON listings (deal, property_type, first_seen);'
+            'CREATE INDEX IF NOT EXISTS listings_last_seen ON listings (deal, property_type, last_seen);'
+        )
+        if 'full' not in {row[1] for row in self.conn.execute('PRAGMA table_info(runs)')}:
+            self.conn.execute('ALTER TABLE runs ADD COLUMN full INTEGER DEFAULT 0')
+        self.conn.commit()
+
+    def start_run(self, deal: str, property_type: str) -> int:
+        cursor = self.conn.execute(
+            'INSERT INTO runs (deal, property_type, started_at) VALUES (?, ?, ?)', (deal, property_type, time.time())
+        )
+        self.conn.commit()
+        return cursor.lastrowid
+
+    def finish_run(self, run_id: int, full: bool = False) -> None:
+        self.conn.execute('UPDATE runs SET finished_at = ?, full = ? WHERE id = ?', (time.time(), int(full), run_id))
+        self.conn.commit()
+
+    def urls(self, deal: str, property_type: str) -> set:
+        rows = self.conn.execute('SELECT url FROM listings WHERE deal = ? AND property_type = ?', (deal, property_type))
+        return {url for url, in rows}
+
+    def known_hashes(self, urls: list[str]) -> dict:
+        hashes = {}
+        for start in range(0, len(urls), 500):
+            batch = urls[start:start + 500]
+            rows = self.conn.execute(f'SELECT url, hash FROM listings WHERE url IN ({", ".join("?" * len(batch))})', batch)
+            hashes.update(rows)
+        return hashes
+
+    def record(self, df: 'pd.DataFrame', deal: str, property_type: str, scraped_at: float | None = None) -> dict:
+        scraped_at = scraped_at or time.time()
+        df = df.drop_duplicates('URL', keep='last')
+        prices = typed_columns(df[['Цена']])['Цена (int)'] if 'Цена' in df.columns else pd.Series(index=df.index, dtype=float)
+        columns = list(df.columns)
+        known = self.known_hashes(df['URL'].tolist())
+
+        versions, upserts, seen = [], [], []
+        for values, price in zip(df.itertuples(index=False, name=None), prices.tolist()):
+            url = values[0]
+            digest = content_hash(list(values))
+            price = None if pd.isna(price) else price
+            if known.get(url) == digest:
+                seen.append((scraped_at, url))
+                continue
+            payload = json.dumps(dict(zip(columns, values)), ensure_ascii=False)
+            versions.append((url, scraped_at, digest, price, payload))
+            upserts.append((url, deal, property_type, digest, price, scraped_at, scraped_at, scraped_at))
+
+        with self.conn:
+            self.conn.executemany(
+                'INSERT INTO versions (url, scraped_at, hash, price, payload) VALUES (?, ?, ?, ?, ?)', versions
+            )
+            self.conn.executemany(
+                'INSERT INTO listings (url, deal, property_type, hash, price, first_seen, last_seen, last_changed) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (url) DO UPDATE SET '
+                'hash = excluded.hash, price = excluded.price, last_seen = excluded.last_seen, last_changed = excluded.last_changed',
+                upserts
+            )
+            self.conn.executemany('UPDATE listings SET last_seen = ? WHERE url = ?', seen)
+
+        new = sum(1 for url, *_ in upserts if url not in known)
+        return {'new': new, 'changed': len(upserts) - new, 'unchanged': len(seen)}
+
+    def scope(self, deal: str | None, property_type: str | None, alias: str = 'l') -> tuple[str, list]:
+        clauses, params = [], []
+        if deal:
+            clauses.append(f'{alias}.deal = ?')
+            params.append(deal)
+        if property_type:
+            clauses.append(f'{alias}.property_type = ?')
+            params.append(property_type)
+        return ''.join(f' AND {clause}' for clause in clauses), params
+
+    def frame(self, sql: str, params: list, time_columns: tuple = ()) -> 'pd.DataFrame':
+        df = pd.read_sql_query(sql, self.conn, params=params)
+        for column in time_columns:
+            df[column] = pd.to_datetime(df[column], unit='s')
+        return df
+
+    def price_changes(self, since, deal: str | None = None, property_type: str | None = None) -> 'pd.DataFrame':
+        scope, params = self.scope(deal, property_type)
+        return self.frame(
+            'SELECT v.url, v.old_price, v.price AS new_price, v.price - v.old_price AS delta, v.scraped_at AS changed_at '
+            'FROM (SELECT url, scraped_at, price, LAG(price) OVER (PARTITION BY url ORDER BY scraped_at) AS old_price '
+            '      FROM versions WHERE url IN (SELECT url FROM versions WHERE scraped_at >= ?)) v '
+            'JOIN listings l ON l.url = v.url '
+            f'WHERE v.scraped_at >= ? AND v.old_price IS NOT NULL AND v.price IS NOT v.old_price{scope} '
+            'ORDER BY v.scraped_at DESC',
+            [to_timestamp(since)] * 2 + params,
+            ('changed_at',)
+        )
+
+    def new_listings(self, since, deal: str | None = None, property_type: str | None = None) -> 'pd.DataFrame':
+        scope, params = self.scope(deal, property_type)
+        return self.frame(
+            f'SELECT l.url, l.deal, l.property_type, l.price, l.first_seen FROM listings l WHERE l.first_seen >= ?{scope} '
+            'ORDER BY l.first_seen DESC',
+            [to_timestamp(since)] + params,
+            ('first_seen',)
+        )
+
+    def removed_listings(self, since, deal: str | None = None, property_type: str | None = None) -> 'pd.DataFrame':
+        scope, params = self.scope(deal, property_type)
+        return self.frame(
+            'SELECT l.url, l.deal, l.property_type, l.price, l.last_seen FROM listings l '
+            'WHERE l.last_seen >= ? AND l.last_seen < (SELECT MAX(r.started_at) FROM runs r '
+            f'WHERE r.deal = l.deal AND r.property_type = l.property_type AND r.full = 1){scope} '
+            'ORDER BY l.last_seen DESC',
+            [to_timestamp(since)] + params,
+            ('last_seen',)
+        )
+
+    def versions(self, url: str) -> 'pd.DataFrame':
+        df = self.frame('SELECT scraped_at, hash, price, payload FROM versions WHERE url = ? ORDER BY scraped_at', [url], ('scraped_at',))
+        df['payload'] = df['payload'].map(json.loads)
+        return df
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+class HistoryWriter:
+    default_name = 'history.sqlite'
+
+    def __init__(self, filepath: Path, deal: str, property_type: str):
+        self.deal = deal
+        self.property_type = property_type
+        self.history = ListingHistory(filepath)
+        self.run_id = self.history.start_run(deal, property_type)
+        self.stats = {'new': 0, 'changed': 0, 'unchanged': 0}
+
+    def read_urls(self) -> set:
+        return self.history.urls(self.deal, self.property_type)
+
+    def write(self, df: 'pd.DataFrame') -> None:
+        for key, count in self.history.record(df, self.deal, self.property_type).items():
+            self.stats[key] += count
+
+    def close(self, full: bool = False) -> None:
+        if self.run_id is not None:
+            self.history.finish_run(self.run_id, full)
+            self.run_id = None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Query the listing history store')
+    parser.add_argument('path', nargs='?', default='history.sqlite')
+    parser.add_argument('--since', required=True)
+    parser.add_argument('--deal', default=None)
+    parser.add_argument('--type', default=None)
+    parser.add_argument('--report', default='changes', choices=['changes', 'new', 'removed'])
+    args = parser.parse_args()
+
+    history = ListingHistory(args.path)
+    queries = {'changes': history.price_changes, 'new': history.new_listings, 'removed': history.removed_listings}
+    print(queries[args.report](args.since, args.deal, args.type).to_string(index=False))
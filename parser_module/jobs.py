@@ -0,0 +1,187 @@
+# jobs.py
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+from parser_module.main import Builder
+from parser_module.limiter import HostLimiters
+
+
+class JobStore:
+    def __init__(self, path: str = 'jobs.sqlite'):
+        self.path = Path(path)
+        self.conn = sqlite3.connect(self.path, timeout=30)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            'id INTEGER PRIMARY KEY, deal TEXT, property_type TEXT, start_page INTEGER, stop_page INTEGER, '
+            'output_path TEXT, status TEXT, created_at REAL);'
+            'CREATE TABLE IF NOT EXISTS tasks ('
+            'id INTEGER PRIMARY KEY, job_id INTEGER, kind TEXT, url TEXT, status TEXT, attempts INTEGER DEFAULT 0, '
+            'next_attempt_at REAL DEFAULT 0, error TEXT, UNIQUE (job_id, kind, url));'
+            'CREATE INDEX IF NOT EXISTS tasks_pending ON tasks (status, next_attempt_at);'
+        )
+        self.conn.commit()
+
+    def add_job(self, deal: str, property_type: str, start_page: int, stop_page: int, output_path: str | None) -> int:
+        cursor = self.conn.execute(
+            'INSERT INTO jobs (deal, property_type, start_page, stop_page, output_path, status, created_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (deal, property_type, start_page, stop_page, output_path, 'running', time.time())
+        )
+        self.conn.commit()
+        return cursor.lastrowid
+
+    def jobs(self, status: str | None = None) -> list[dict]:
+        query = 'SELECT id, deal, property_type, start_page, stop_page, output_path, status FROM jobs'
+        rows = self.conn.execute(query + ' WHERE status = ?', (status,)) if status else self.conn.execute(query)
+        keys = ('id', 'deal', 'property_type', 'start_page', 'stop_page', 'output_path', 'status')
+        return [dict(zip(keys, row)) for row in rows]
+
+    def add_tasks(self, job_id: int, kind: str, urls: list[str]) -> None:
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO tasks (job_id, kind, url, status) VALUES (?, ?, ?, 'pending')",
+            [(job_id, kind, url) for url in urls]
+        )
+        self.conn.commit()
+
+    def claim(self) -> tuple | None:
+        row = self.conn.execute(
+            "SELECT id, job_id, kind, url, attempts FROM tasks WHERE status = 'pending' AND next_attempt_at <= ? "
+            "ORDER BY kind = 'unit' DESC, id LIMIT 1",
+            (time.time(),)
+        ).fetchone()
+        if row is not None:
+            self.conn.execute("UPDATE tasks SET status = 'running' WHERE id = ?", (row[0],))
+            self.conn.commit()
+        return row
+
+    def complete(self, task_id: int) -> None:
+        self.conn.execute("UPDATE tasks SET status = 'done', error = NULL WHERE id = ?", (task_id,))
+        self.conn.commit()
+
+    def fail(self, task_id: int, attempts: int, error: str, max_attempts: int, backoff: float) -> None:
+        attempts += 1
+        if attempts >= max_attempts:
+            self.conn.execute(
+                "UPDATE tasks SET status = 'failed', attempts = ?, error = ? WHERE id = ?", (attempts, error, task_id)
+            )
+        else:
+            self.conn.execute(
+                "UPDATE tasks SET status = 'pending', attempts = ?, error = ?, next_attempt_at = ? WHERE id = ?",
+                (attempts, error, time.time() + backoff * 2 ** (attempts - 1), task_id)
+            )
+        self.conn.commit()
+
+    def next_retry_delay(self) -> float | None:
+        row = self.conn.execute("SELECT MIN(next_attempt_at) FROM tasks WHERE status = 'pending'").fetchone()
+        if row[0] is None:
+            return None
+        return max(0.0, row[0] - time.time())
+
+    def reset_running(self) -> None:
+        self.conn.execute("UPDATE tasks SET status = 'pending' WHERE status = 'running'")
+        self.conn.commit()
+
+    def requeue_unsaved(self, job_id: int, saved_urls: set) -> None:
+        rows = self.conn.execute(
+            "SELECT id, url FROM tasks WHERE job_id = ? AND kind = 'unit' AND status = 'done'", (job_id,)
+        ).fetchall()
+        lost = [(task_id,) for task_id, url in rows if url not in saved_urls]
+        self.conn.executemany("UPDATE tasks SET status = 'pending' WHERE id = ?", lost)
+        self.conn.commit()
+
+    def finish_jobs(self) -> None:
+        self.conn.execute(
+            "UPDATE jobs SET status = 'done' WHERE status = 'running' AND NOT EXISTS "
+            "(SELECT 1 FROM tasks WHERE tasks.job_id = jobs.id AND tasks.status IN ('pending', 'running'))"
+        )
+        self.conn.commit()
+
+    def summary(self) -> dict:
+        summary = {}
+        for job_id, status, count in self.conn.execute('SELECT job_id, status, COUNT(*) FROM tasks GROUP BY job_id, status'):
+            summary.setdefault(job_id, {})[status] = count
+        return summary
+
+
+class JobScheduler:
+    def __init__(self, store: JobStore, max_concurrency: int = 20, max_attempts: int = 5, backoff: float = 2.0, **builder_options):
+        self.store = store
+        self.max_concurrency = max_concurrency
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.builder_options = builder_options
+        self.limiters = HostLimiters(max_limit=max_concurrency)
+        self.runners = {}
+
+    def add_job(self, property_type: str, start_page: int, stop_page: int, deal: str = 'sale', output_path: str | None = None) -> int:
+        job_id = self.store.add_job(deal, property_type, start_page, stop_page, output_path)
+        runner = self.runner_for({
+            'id': job_id, 'deal': deal, 'property_type': property_type,
+            'start_page': start_page, 'stop_page': stop_page, 'output_path': output_path,
+        })
+        self.store.add_tasks(job_id, 'page', runner.get_page_urls())
+        return job_id
+
+    def runner_for(self, job: dict):
+        runner = self.runners.get(job['id'])
+        if runner is None:
+            builder = Builder(job['property_type'], job['start_page'], job['stop_page'], job['deal'], job['output_path'],
+                              max_concurrency=self.max_concurrency, **self.builder_options)
+            runner = self.runners[job['id']] = builder.build()
+            runner.parser.limiters = self.limiters
+        return runner
+
+    def execute(self, task: tuple):
+        task_id, job_id, kind, url, attempts = task
+        runner = self.runners[job_id]
+        if kind == 'page':
+            return runner.collect_page(url)
+        return runner.parse_unit(url)
+
+    def apply(self, task: tuple, future) -> None:
+        task_id, job_id, kind, url, attempts = task
+        try:
+            result = future.result()
+        except Exception as e:
+            print(f"[Error in {kind} task] {url}: {e}")
+            self.store.fail(task_id, attempts, str(e), self.max_attempts, self.backoff)
+            return
+
+        if kind == 'page':
+            self.store.add_tasks(job_id, 'unit', result)
+        else:
+            self.runners[job_id].filemanager.add(result)
+        self.store.complete(task_id)
+
+    def run(self) -> dict:
+        self.store.reset_running()
+        for job in self.store.jobs('running'):
+            runner = self.runner_for(job)
+            self.store.requeue_unsaved(job['id'], runner.filemanager.existing_urls)
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+                in_flight = {}
+                while True:
+                    while len(in_flight) < self.max_concurrency and (task := self.store.claim()) is not None:
+                        in_flight[pool.submit(self.execute, task)] = task
+
+                    if not in_flight:
+                        delay = self.store.next_retry_delay()
+                        if delay is None:
+                            break
+                        time.sleep(min(delay, 1.0))
+                        continue
+
+                    done, _ = wait(in_flight, timeout=1.0, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        self.apply(in_flight.pop(future), future)
+        finally:
+            for runner in self.runners.values():
+                runner.filemanager.close()
+            self.runners = {}
+
+        self.store.finish_jobs()
+        return self.store.summary()
@@ -0,0 +1,29 @@
+# lazy.py
+import importlib
+import threading
+
+
+class LazyModule:
+    def __init__(self, name: str):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+        self.__dict__['_lock'] = threading.Lock()
+
+    def load(self):
+        module = self.__dict__['_module']
+        if module is None:
+            with self.__dict__['_lock']:
+                module = self.__dict__['_module']
+                if module is None:
+                    module = self.__dict__['_module'] = importlib.import_module(self.__dict__['_name'])
+        return module
+
+    def __getattr__(self, name: str):
+        return getattr(self.load(), name)
+
+    def __repr__(self) -> str:
+        return f"<lazy module '{self.__dict__['_name']}'>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    return LazyModule(name)
@@ -0,0 +1,123 @@
+# limiter.py
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, asynccontextmanager
+from urllib.parse import urlparse
+
+
+class AdaptiveLimiter:
+    def __init__(self, max_limit: int = 20, min_limit: int = 1, initial: int | None = None,
+                 target_latency: float = 2.0, decrease: float = 0.5, window: int = 500):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = initial or min(10, max_limit)
+        self.target_latency = target_latency
+        self.decrease = decrease
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.successes = 0
+        self.last_decrease = 0.0
+        self.latencies = deque(maxlen=window)
+        self.condition = threading.Condition()
+        self.async_condition = None
+        self.async_loop = None
+
+    def record(self, latency: float, ok: bool) -> None:
+        now = time.time()
+        self.requests += 1
+        self.latencies.append(latency)
+        if not ok:
+            self.errors += 1
+
+        if not ok or latency > self.target_latency:
+            self.successes = 0
+            if now - self.last_decrease > self.target_latency:
+                self.limit = max(self.min_limit, int(self.limit * self.decrease))
+                self.last_decrease = now
+        else:
+            self.successes += 1
+            if self.successes >= self.limit:
+                self.limit = min(self.max_limit, self.limit + 1)
+                self.successes = 0
+
+    @staticmethod
+    def is_ok(outcome: dict) -> bool:
+        status = outcome.get('status')
+        return status is not None and status != 429 and status < 500
+
+    @contextmanager
+    def slot(self):
+        with self.condition:
+            while self.in_flight >= self.limit:
+                self.condition.wait()
+            self.in_flight += 1
+
+        outcome = {}
+        start = time.time()
+        try:
+            yield outcome
+        finally:
+            with self.condition:
+                self.in_flight -= 1
+                self.record(time.time() - start, self.is_ok(outcome))
+                self.condition.notify_all()
+
+    @asynccontextmanager
+    async def async_slot(self):
+        loop = asyncio.get_running_loop()
+        if self.async_loop is not loop:
+            self.async_loop = loop
+            self.async_condition = asyncio.Condition()
+
+        async with self.async_condition:
+            await self.async_condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+
+        outcome = {}
+        start = time.time()
+        try:
+            yield outcome
+        finally:
+            async with self.async_condition:
+                self.in_flight -= 1
+                self.record(time.time() - start, self.is_ok(outcome))
+                self.async_condition.notify_all()
+
+    def percentile(self, q: float) -> float | None:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 4)
+
+    def stats(self) -> dict:
+        return {
+            'limit': self.limit,
+            'in_flight': self.in_flight,
+            'requests': self.requests,
+            'errors': self.errors,
+            'p50': self.percentile(0.5),
+            'p90': self.percentile(0.9),
+            'p99': self.percentile(0.99),
+        }
+
+
+class HostLimiters:
+    def __init__(self, max_limit: int = 20, **kwargs):
+        self.max_limit = max_limit
+        self.kwargs = kwargs
+        self.limiters = {}
+        self.lock = threading.Lock()
+
+    def get(self, url: str) -> AdaptiveLimiter:
+        host = urlparse(url).netloc
+        with self.lock:
+            limiter = self.limiters.get(host)
+            if limiter is None:
+                limiter = self.limiters[host] = AdaptiveLimiter(self.max_limit, **self.kwargs)
+            return limiter
+
+    def stats(self) -> dict:
+        return {host: limiter.stats() for host, limiter in self.limiters.items()}
@@ -1,74 +1,481 @@
 # main.py
 from parser_module.config import Config
 from parser_module.parsers import *
-from parser_module.utils import FileManager
+from parser_module.utils import FileManager, WriterError, make_process_pool, parse_in_worker
+from parser_module.limiter import HostLimiters
+from parser_module.metrics import Metrics
+from parser_module.writers import WRITERS
+from parser_module.dedup import normalize_url, make_seen, AsyncCoalescer
+import json
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import queue
+import asyncio
+import threading
+from collections import deque
+from contextlib import nullcontext
+from pathlib import Path
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+@dataclass
+class RunStats:
+    pages_done: int = 0
+    units_done: int = 0
+    errors: int = 0
+    started_at: float = field(default_factory=time.time)
+
+    def throughput(self) -> float:
+        elapsed = time.time() - self.started_at
+        return round(self.units_done / elapsed, 2) if elapsed > 0 else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            'pages_done': self.pages_done,
+            'units_done': self.units_done,
+            'errors': self.errors,
+            'elapsed': round(time.time() - self.started_at, 2),
+            'units_per_second': self.throughput(),
+        }
 
 
 class Runner:
-    def __init__(self, parser, filemanager, deal, property_type, start_page, stop_page, pattern_url):
+    def __init__(self, parser, filemanager, deal, property_type, start_page, stop_page, pattern_url, parse_workers: int=0,
+                 incremental: bool=False, stop_known_ratio: float | None=None, max_concurrency: int=20, on_record=None,
+                 dedup: str='set', seen_size: int | None=None, crawl_all: bool=False, max_page_failures: int=5):
         self.parser = parser
         self.filemanager = filemanager
+        self.metrics = Metrics()
+        self.parser.use_metrics(self.metrics)
+        self.filemanager.metrics = self.metrics
         self.deal = deal
         self.property_type = property_type
         self.start_page = start_page
         self.stop_page = stop_page
         self.pattern_url = pattern_url
+        self.parse_workers = parse_workers
+        self.parse_pool = None
+        self.incremental = incremental
+        self.stop_known_ratio = stop_known_ratio
+        self.last_page = stop_page
+        self.seen_pages = deque(maxlen=50)
+        self.dedup = dedup
+        self.seen_size = seen_size
+        self.crawl_all = crawl_all
+        self.max_page_failures = max_page_failures
+        self.page_failures = 0
+        self.seen_units = make_seen(dedup, self.seen_capacity())
+        self.failure = None
+        self.pages = iter(())
+        self.max_concurrency = max_concurrency
+        self.window = max_concurrency * 2
+        self.on_record = on_record
+        self.stats = RunStats()
+        self.duration = None
+
+    def get_page_url(self, page: int) -> str:
+        return self.pattern_url + str(page)
 
     def get_page_urls(self):
-        return [self.pattern_url + str(url) for url in range(self.start_page, self.stop_page)]
+        return [self.get_page_url(page) for page in range(self.start_page, self.stop_page)]
+
+    def make_parse_pool(self):
+        if self.parse_workers:
+            return make_process_pool(self.parse_workers)
+        return nullcontext()
+
+    def worker_args(self, method: str) -> tuple:
+        return type(self.parser), self.parser.backend, self.parser.config.base_url, method
+
+    def run_parse(self, method: str, *args):
+        if self.parse_pool is None:
+            return getattr(self.parser, method)(*args)
+        return self.parse_pool.submit(parse_in_worker, *self.worker_args(method), *args).result()
+
+    def collect_page(self, url: str) -> list:
+        return self.run_parse('collect_units_from_html', self.parser.get_html(url))
+
+    def parse_unit(self, unit: str):
+        return self.run_parse('parse_html', self.parser.get_html(unit), unit)
+
+    def filter_units(self, page: int, units: list) -> list:
+        if not self.incremental:
+            return units
+
+        known = self.filemanager.existing_urls
+        new_units = [unit for unit in units if unit not in known]
+        if self.stop_known_ratio is not None and units and 1 - len(new_units) / len(units) >= self.stop_known_ratio:
+            self.last_page = min(self.last_page, page)
+        return new_units
+
+    def seen_capacity(self) -> int:
+        if self.seen_size:
+            return self.seen_size
+        return (self.stop_page - self.start_page) * self.parser.config.units_per_page * 2
+
+    def dedup_units(self, units: list) -> list:
+        new_units = [unit for unit in units if self.seen_units.add(unit)]
+        if len(new_units) < len(units):
+            self.metrics.inc('units_deduplicated', len(units) - len(new_units))
+        return new_units
+
+    def check_page(self, page: int, units: list) -> list:
+        if page > self.last_page or self.failure is not None:
+            return []
+        units = [normalize_url(unit) for unit in units]
+        if self.crawl_all and (not units or set(units) <= set().union(*self.seen_pages)):
+            self.last_page = min(self.last_page, page - 1)
+            return []
+        self.seen_pages.append(set(units))
+        return self.dedup_units(self.filter_units(page, units))
+
+    def page_failed(self, e: Exception) -> None:
+        self.stats.errors += 1
+        self.page_failures += 1
+        print(f"[Error collecting page] {e}")
+        if self.crawl_all and self.page_failures == self.max_page_failures:
+            print(f"[Stopping after {self.page_failures} failed pages in a row]")
+            self.pages = iter(())
+
+    def next_page(self) -> int | None:
+        page = next(self.pages, None)
+        if page is None or page > self.last_page or self.failure is not None:
+            return None
+        return page
+
+    def start_paging(self) -> None:
+        self.last_page = self.stop_page
+        self.seen_pages.clear()
+        self.seen_units = make_seen(self.dedup, self.seen_capacity())
+        self.failure = None
+        self.page_failures = 0
+        self.pages = iter(range(self.start_page, self.stop_page))
 
     def collect_units_generator(self):
-        urls = self.get_page_urls()
+        self.start_paging()
         with ThreadPoolExecutor(max_workers=10) as page_pool:
-            futures = {page_pool.submit(self.parser.collect_units, url): url for url in urls}
-            for future in as_completed(futures):
-                page_units = future.result()
-                for unit in page_units:
-                    yield unit
+            futures = {}
+            while True:
+                while len(futures) < 10 and (page := self.next_page()) is not None:
+                    futures[page_pool.submit(self.collect_page, self.get_page_url(page))] = page
+                if not futures:
+                    break
+
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    page = futures.pop(future)
+                    try:
+                        page_units = self.check_page(page, future.result())
+                    except Exception as e:
+                        self.page_failed(e)
+                        continue
+                    self.page_failures = 0
+                    self.stats.pages_done += 1
+                    for unit in page_units:
+                        yield unit
+
+    def handle_result(self, result) -> None:
+        self.filemanager.add(result)
+        self.record_result(result)
+
+    def record_result(self, result) -> None:
+        self.stats.units_done += 1
+        if self.on_record is not None:
+            self.on_record(result)
+
+    def handle_error(self, e: Exception) -> None:
+        self.stats.errors += 1
+        print(f"[Error parsing unit] {e}")
+
+    def is_full_run(self) -> bool:
+        return self.crawl_all and not self.incremental and not self.stats.errors
+
+    def report(self) -> dict:
+        return {
+            'duration': self.duration,
+            'stats': self.stats.as_dict(),
+            'metrics': self.metrics.report(),
+            'limiters': self.parser.limiters.stats(),
+        }
+
+    def save_report(self, path: str, fmt: str = 'json') -> None:
+        if fmt == 'prometheus':
+            text = self.metrics.to_prometheus()
+        elif fmt == 'jsonl':
+            text = self.metrics.to_json_lines()
+        else:
+            text = json.dumps(self.report(), ensure_ascii=False, indent=2)
+        Path(path).write_text(text, encoding='utf-8')
 
     def run(self):
         self.parser.clean_old_cache()
+        self.stats = RunStats()
+        self.metrics.reset()
         start = time.time()
 
-        with ThreadPoolExecutor(max_workers=20) as unit_pool:
-            future_to_unit = {unit_pool.submit(self.parser.parse, unit): unit for unit in self.collect_units_generator()}
+        completed = False
+        try:
+            with self.make_parse_pool() as self.parse_pool, ThreadPoolExecutor(max_workers=self.max_concurrency) as unit_pool:
+                units = self.collect_units_generator()
+                in_flight = set()
+                while True:
+                    while len(in_flight) < self.window and (unit := next(units, None)) is not None:
+                        in_flight.add(unit_pool.submit(self.parse_unit, unit))
+                    if not in_flight:
+                        break
 
-            for future in as_completed(future_to_unit):
-                try:
-                    result = future.result()
-                    self.filemanager.add(result)
-                except Exception as e:
-                    print(f"[Error parsing unit] {e}")
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        try:
+                            self.handle_result(future.result())
+                        except WriterError:
+                            for pending in in_flight:
+                                pending.cancel()
+                            units.close()
+                            raise
+                        except Exception as e:
+                            self.handle_error(e)
+            completed = True
+        finally:
+            self.parse_pool = None
+            self.filemanager.close(full=completed and self.is_full_run())
 
-        self.filemanager.save()
         end = time.time()
-        return round(end - start, 4)
+        self.duration = round(end - start, 4)
+        return self.duration
+
+    def iter_records(self):
+        records = queue.Queue()
+        done = object()
+        errors = []
+        previous = self.on_record
+        self.on_record = records.put
+
+        def target():
+            try:
+                self.run()
+            except Exception as e:
+                errors.append(e)
+            finally:
+                records.put(done)
+
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+        try:
+            while (record := records.get()) is not done:
+                yield record
+        finally:
+            thread.join()
+            self.on_record = previous
+        if errors:
+            raise errors[0]
+
+
+class AsyncRunner(Runner):
+    async def fetch(self, client, url):
+        return await self.in_flight.run(url, self.download, client, url)
+
+    async def blocking(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    async def download(self, client, url):
+        entry, fresh = await self.blocking(self.parser.lookup_cache, url)
+        if fresh:
+            return entry.text
+
+        headers = await self.blocking(self.parser.request_headers, entry)
+        async with self.parser.limiters.get(url).async_slot() as outcome:
+            start = time.perf_counter()
+            async with client.get(url, headers=headers) as response:
+                outcome['status'] = response.status
+                body = await response.read()
+                text = body.decode(response.get_encoding(), errors='replace') if body else ''
+            self.metrics.observe('fetch', time.perf_counter() - start)
+        self.metrics.inc('bytes_downloaded', len(body))
+        return await self.blocking(self.parser.store_response, url, entry, response.status, text, response.headers)
+
+    async def run_parse_async(self, method: str, *args):
+        if self.parse_pool is None:
+            return await self.blocking(getattr(self.parser, method), *args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.parse_pool, parse_in_worker, *self.worker_args(method), *args)
+
+    async def produce(self, client, queue):
+        while (page := self.next_page()) is not None:
+            try:
+                text = await self.fetch(client, self.get_page_url(page))
+                units = await self.run_parse_async('collect_units_from_html', text)
+            except Exception as e:
+                self.page_failed(e)
+                continue
+
+            self.page_failures = 0
+            self.stats.pages_done += 1
+            for unit in self.check_page(page, units):
+                await queue.put(unit)
+
+    async def consume(self, client, queue):
+        while True:
+            unit = await queue.get()
+            if unit is None:
+                queue.task_done()
+                return
+            if self.failure is not None:
+                queue.task_done()
+                continue
+            try:
+                text = await self.fetch(client, unit)
+                result = await self.run_parse_async('parse_html', text, unit)
+                await self.blocking(self.filemanager.add, result)
+                self.record_result(result)
+            except WriterError as e:
+                self.failure = e
+            except Exception as e:
+                self.handle_error(e)
+            finally:
+                queue.task_done()
+
+    async def crawl(self):
+        queue = asyncio.Queue(maxsize=self.window)
+        self.in_flight = AsyncCoalescer(self.metrics)
+
+        import aiohttp
+        async with aiohttp.ClientSession() as client:
+            consumers = [asyncio.create_task(self.consume(client, queue)) for _ in range(self.max_concurrency)]
+            self.start_paging()
+            await asyncio.gather(*(self.produce(client, queue) for _ in range(10)))
+            for _ in consumers:
+                await queue.put(None)
+            await asyncio.gather(*consumers)
+
+    def run(self):
+        self.parser.clean_old_cache()
+        self.stats = RunStats()
+        self.metrics.reset()
+        start = time.time()
+
+        completed = False
+        try:
+            with self.make_parse_pool() as self.parse_pool:
+                asyncio.run(self.crawl())
+            if self.failure is not None:
+                raise self.failure
+            completed = True
+        finally:
+            self.parse_pool = None
+            self.filemanager.close(full=completed and self.is_full_run())
+
+        end = time.time()
+        self.duration = round(end - start, 4)
+        return self.duration
 
 
 class Builder:
-    def __init__(self, property_type: str, start_page: int, stop_page: int, deal: str='sale', output_path: str=None):
+    def __init__(self, property_type: str, start_page: int, stop_page: int | None, deal: str='sale', output_path: str=None, use_async: bool=False, parse_workers: int=0, cache_backend: str='sqlite',
+                 incremental: bool=False, stop_known_ratio: float | None=None, max_concurrency: int=20,
+                 output_format: str='csv', crawl_all: bool=False, dedup: str='set', seen_size: int | None=None):
         self.property_type = property_type
         self.start_page = start_page
         self.stop_page = stop_page
         self.deal = deal
         self.config = Config()
         self.output_path = output_path
+        self.use_async = use_async
+        self.parse_workers = parse_workers
+        self.cache_backend = cache_backend
+        self.incremental = incremental
+        self.stop_known_ratio = stop_known_ratio
+        self.max_concurrency = max_concurrency
+        self.output_format = output_format
+        self.crawl_all = crawl_all
+        self.dedup = dedup
+        self.seen_size = seen_size
+
+    def get_pattern_url(self) -> str:
+        return self.config.base_url + f'/{self.config.deal_types[self.deal]}-{self.config.property_types[self.property_type]}?page='
+
+    def discover_stop_page(self, parser, pattern_url: str) -> int:
+        try:
+            return max(parser.get_last_page(pattern_url + str(self.start_page)) + 1, self.start_page + 1)
+        except Exception as e:
+            print(f"[Error finding last page] {e}")
+            return self.start_page + self.config.max_pages
 
     def build(self):
         parser_types = self.config.get_parser_types()
         parser = parser_types[self.property_type]()
-        columns = ['URL'] + list(parser.config.const_target_dict.keys()) + list(parser.config.target_dict.keys())
-        filemanager = FileManager(self.deal, self.property_type, columns, self.output_path)
-        pattern_url = self.config.base_url + f'/{self.config.deal_types[self.deal]}-{self.config.property_types[self.property_type]}?page='
+        parser.set_cache_backend(self.cache_backend)
+        parser.limiters = HostLimiters(max_limit=self.max_concurrency)
+        columns = parser.config.get_columns()
+        filemanager = FileManager(self.deal, self.property_type, columns, self.output_path, self.output_format)
+        pattern_url = self.get_pattern_url()
+        stop_page = self.stop_page
+        if self.crawl_all or stop_page is None:
+            stop_page = self.discover_stop_page(parser, pattern_url)
 
-        return Runner(
+        runner_class = AsyncRunner if self.use_async else Runner
+        return runner_class(
             parser=parser,
             filemanager=filemanager,
             deal=self.deal,
             property_type=self.property_type,
             start_page=self.start_page,
-            stop_page=self.stop_page,
-            pattern_url=pattern_url
+            stop_page=stop_page,
+            pattern_url=pattern_url,
+            parse_workers=self.parse_workers,
+            incremental=self.incremental,
+            stop_known_ratio=self.stop_known_ratio,
+            max_concurrency=self.max_concurrency,
+            dedup=self.dedup,
+            seen_size=self.seen_size,
+            crawl_all=self.crawl_all or self.stop_page is None
         )
+
+
+class MultiRunner:
+    def __init__(self, runners: list):
+        self.runners = runners
+        self.reports = {}
+        self.duration = None
+
+    def run(self):
+        start = time.time()
+        for runner in self.runners:
+            runner.run()
+            self.reports[runner.property_type] = runner.report()
+
+        end = time.time()
+        self.duration = round(end - start, 4)
+        return self.duration
+
+    def report(self) -> dict:
+        return {'duration': self.duration, 'runs': self.reports}
+
+
+class MultiBuilder:
+    def __init__(self, property_types: list[str] | None, start_page: int, stop_page: int | None, deal: str='sale',
+                 output_dir: str=None, output_format: str='csv', **options):
+        self.property_types = property_types or list(Config.property_types)
+        self.start_page = start_page
+        self.stop_page = stop_page
+        self.deal = deal
+        self.output_dir = output_dir
+        self.output_format = output_format
+        self.options = options
+
+    def get_output_path(self, property_type: str) -> str | None:
+        if not self.output_dir:
+            return None
+        name = WRITERS[self.output_format].default_name.format(deal=self.deal, property_type=property_type)
+        return str(Path(self.output_dir) / name)
+
+    def build(self) -> MultiRunner:
+        runners = []
+        for property_type in self.property_types:
+            runner = Builder(property_type, self.start_page, self.stop_page, self.deal, self.get_output_path(property_type),
+                             output_format=self.output_format, **self.options).build()
+            if runners:
+                runner.parser.cache = runners[0].parser.cache
+                runner.parser.limiters = runners[0].parser.limiters
+            runners.append(runner)
+        return MultiRunner(runners)
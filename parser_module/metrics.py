@@ -0,0 +1,114 @@
+# metrics.py
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+
+
+class Histogram:
+    def __init__(self, buckets: tuple = BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def quantile(self, q: float) -> float | None:
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.buckets[-1]
+
+    def as_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 4),
+            'mean': round(self.sum / self.count, 4) if self.count else None,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+        }
+
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def reset(self) -> None:
+        with self.lock:
+            self.counters = {}
+            self.histograms = {}
+
+    def inc(self, name: str, value: float = 1) -> None:
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name: str, seconds: float) -> None:
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def report(self) -> dict:
+        with self.lock:
+            counters = dict(self.counters)
+            histograms = {name: histogram.as_dict() for name, histogram in self.histograms.items()}
+        lookups = counters.get('cache_hits', 0) + counters.get('cache_misses', 0)
+        return {
+            'counters': counters,
+            'cache_hit_ratio': round(counters.get('cache_hits', 0) / lookups, 4) if lookups else None,
+            'stages': histograms,
+        }
+
+    def to_json_lines(self) -> str:
+        now = time.time()
+        report = self.report()
+        lines = [json.dumps({'ts': now, 'type': 'counter', 'name': name, 'value': value}) for name, value in report['counters'].items()]
+        lines += [json.dumps({'ts': now, 'type': 'stage', 'name': name, **stage}) for name, stage in report['stages'].items()]
+        return '\n'.join(lines) + '\n'
+
+    def to_prometheus(self, prefix: str = 'housekg') -> str:
+        lines = []
+        with self.lock:
+            for name, value in self.counters.items():
+                lines.append(f'# TYPE {prefix}_{name}_total counter')
+                lines.append(f'{prefix}_{name}_total {value}')
+            for name, histogram in self.histograms.items():
+                metric = f'{prefix}_{name}_seconds'
+                lines.append(f'# TYPE {metric} histogram')
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else bound
+                    lines.append(f'{metric}_bucket{{le="{le}"}} {cumulative}')
+                lines.append(f'{metric}_sum {histogram.sum}')
+                lines.append(f'{metric}_count {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
@@ -1,30 +1,44 @@
 # parsers.py
 from parser_module.utils import BaseParser
-from parser_module.config import SectorConfig, PrivateHouseConfig, ApartmentConfig
+from parser_module.config import SCHEMAS
+
+class SchemaParser(BaseParser):
+    property_type = None
 
-class SectorParser(BaseParser):
     def __init__(self):
-        config = SectorConfig()
+        config = SCHEMAS[self.property_type]()
         super().__init__(target_dict=config.target_dict, config=config)
 
     def run(self):
         pass
-    
 
-class PrivateHouseParser(BaseParser):
-    def __init__(self):
-        config = PrivateHouseConfig()
-        super().__init__(target_dict=config.target_dict, config=config)
 
-    def run(self):
-        pass
+class SectorParser(SchemaParser):
+    property_type = 'sector'
 
 
-class ApartmentParser(BaseParser):
-    def __init__(self):
-        config = ApartmentConfig()
-        super().__init__(target_dict=config.target_dict, config=config)
+class PrivateHouseParser(SchemaParser):
+    property_type = 'private_house'
 
-    def run(self):
-        pass
-    
\ No newline at end of file
+
+class ApartmentParser(SchemaParser):
+    property_type = 'apartment'
+
+
+class RoomParser(SchemaParser):
+    property_type = 'room'
+
+
+class CountryHouseParser(SchemaParser):
+    property_type = 'country_house'
+
+
+class CommercialPropertyParser(SchemaParser):
+    property_type = 'commercial_property'
+
+
+class ParkingAndGarageParser(SchemaParser):
+    property_type = 'parking_and_garage'
+
+
+PARSERS = {parser.property_type: parser for parser in SchemaParser.__subclasses__()}
@@ -0,0 +1,28 @@
+# transform.py
+from parser_module.lazy import lazy_import
+
+pd = lazy_import('pandas')
+
+
+def typed_columns(df: 'pd.DataFrame') -> 'pd.DataFrame':
+    typed = pd.DataFrame(index=df.index)
+
+    if 'Цена' in df.columns:
+        typed['Цена (int)'] = pd.to_numeric(
+            df['Цена'].astype(str).str.replace(r'[$ ,]', '', regex=True).str.extract(r'(\d+)')[0],
+            errors='coerce'
+        ).astype(float)
+    if 'Площадь участка' in df.columns:
+        typed['Площадь (сотки)'] = pd.to_numeric(
+            df['Площадь участка'].astype(str).str.extract(r'(\d+\.?\d*)')[0], errors='coerce'
+        ).astype(float)
+    if 'Площадь' in df.columns:
+        typed['House Area'] = pd.to_numeric(
+            df['Площадь'].astype(str).str.extract(r'(\d+\.?\d*)')[0], errors='coerce'
+        ).astype(float)
+    if 'Название' in df.columns:
+        names = df['Название'].astype(str)
+        rooms = pd.to_numeric(names.str.extract(r'(\d+)-комн')[0], errors='coerce')
+        typed['Rooms'] = rooms.mask(rooms.isna() & names.str.contains('и более', regex=False), 6).astype('Int64')
+
+    return typed
@@ -0,0 +1,39 @@
+# useragent.py
+import itertools
+import threading
+
+FALLBACK_USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.4 Safari/605.1.15',
+    'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:125.0) Gecko/20100101 Firefox/125.0',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36 Edg/124.0.0.0',
+]
+
+
+class UserAgentPool:
+    def __init__(self, size: int = 20):
+        self.size = size
+        self.agents = None
+        self.cycle = None
+        self.lock = threading.Lock()
+
+    def load(self) -> list[str]:
+        try:
+            import fake_useragent
+            generator = fake_useragent.UserAgent()
+            agents = list(dict.fromkeys(generator.random for _ in range(self.size)))
+        except Exception as e:
+            print(f"[Error loading user agents] {e}")
+            agents = []
+        return agents or list(FALLBACK_USER_AGENTS)
+
+    def next(self) -> str:
+        with self.lock:
+            if self.cycle is None:
+                self.agents = self.load()
+                self.cycle = itertools.cycle(self.agents)
+            return next(self.cycle)
+
+
+user_agents = UserAgentPool()
@@ -1,35 +1,66 @@
 # utils.py
-import requests
-from bs4 import BeautifulSoup as bs, SoupStrainer
-import requests.adapters
 from parser_module.config import Config
-import lxml
+from parser_module.cache import CacheEntry, make_cache
+from parser_module.limiter import HostLimiters
+from parser_module.writers import WRITERS
+from parser_module.metrics import Metrics, metrics
+from parser_module.lazy import lazy_import
+from parser_module.useragent import user_agents
+from parser_module.dedup import Coalescer
 from pathlib import Path
-import pandas as pd
 from abc import ABC, abstractmethod
 from typing import Any
-from urllib3.util.retry import Retry
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
 import threading
-import hashlib
+import queue
 import time
 import os
 
+pd = lazy_import('pandas')
+bs4 = lazy_import('bs4')
+html = lazy_import('lxml.html')
+etree = lazy_import('lxml.etree')
 
-session = requests.Session()
-adapter = requests.adapters.HTTPAdapter(pool_connections=100, pool_maxsize=100, max_retries=Retry(total=5, backoff_factor=0.2))
-session.mount('http://', adapter)
-session.mount('https://', adapter)
+class FetchError(Exception):
+    pass
+
+
+class WriterError(Exception):
+    pass
+
+
+session = None
+session_lock = threading.Lock()
+
+
+def get_session():
+    global session
+    with session_lock:
+        if session is None:
+            import requests
+            import requests.adapters
+            from urllib3.util.retry import Retry
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=100, pool_maxsize=100, max_retries=Retry(total=5, backoff_factor=0.2))
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        return session
 
 
 class FileManager:
-    def __init__(self, deal: str, property_type: str, columns: list[str], output_path: str | None = None):
+    def __init__(self, deal: str, property_type: str, columns: list[str], output_path: str | None = None, output_format: str = 'csv',
+                 queue_size: int = 5000, flush_interval: float = 5.0):
         self.deal = deal
         self.property_type = property_type
         self.columns = columns
         self.rows = []
-        self.existing_urls = set()
-        self.lock = threading.Lock()
         self.BATCH_SIZE = 1000
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.error = None
+        self.metrics = metrics
+        writer_class = WRITERS[output_format]
 
         if output_path:
             self.filepath = Path(output_path)
@@ -39,38 +70,103 @@ class FileManager:
             else:
                 output_dir = Path().absolute()
 
-            self.filepath = output_dir / f'{self.deal}_{self.property_type}.csv'
+            self.filepath = output_dir / writer_class.default_name.format(deal=self.deal, property_type=self.property_type)
+
+        self.writer = writer_class(self.filepath, self.deal, self.property_type)
+        self.existing_urls = self.writer.read_urls()
+        self.thread = threading.Thread(target=self.write_loop, daemon=True)
+        self.thread.start()
+
+    def add(self, record: 'Record') -> None:
+        if self.error is not None:
+            raise self.error
+        self.queue.put(record.values)
 
-        if self.filepath.exists():
-            df = pd.read_csv(self.filepath, usecols=['URL'])
-            self.existing_urls = set(df['URL'].dropna().tolist())
+    def write_loop(self) -> None:
+        last_flush = time.time()
+        while True:
+            try:
+                values = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                values = ()
+            if values is None:
+                break
+            if values:
+                self.rows.append(values)
 
-    def add(self, data: dict) -> None:
-        with self.lock:
-            completed_data = {col: data.get(col, '') for col in self.columns}
-            self.rows.append(completed_data)
             if len(self.rows) >= self.BATCH_SIZE:
+                if self.save():
+                    print('\n---------20 PAGEs SCRAPED---------------\n')
+                last_flush = time.time()
+            elif self.rows and time.time() - last_flush >= self.flush_interval:
                 self.save()
-                print('\n---------20 PAGEs SCRAPED---------------\n')
-                self.rows = []
+                last_flush = time.time()
+        self.save()
 
-    def save(self) -> None:
+    def save(self) -> bool:
         if not self.rows:
-            return
-        df = pd.DataFrame(self.rows)
-        df = df[self.columns]
-        
-        self.filepath.parent.mkdir(parents=True, exist_ok=True)
-        
-        df.to_csv(
-            self.filepath,
-            mode='a',
-            header=not self.filepath.exists(),
-            index=False,
-        )
+            return False
+        rows, self.rows = self.rows, []
+        if self.error is not None:
+            return False
+        try:
+            with self.metrics.timer('write'):
+                df = pd.DataFrame(rows, columns=self.columns)
+                self.writer.write(df)
+            self.metrics.inc('rows_written', len(rows))
+            return True
+        except Exception as e:
+            self.error = WriterError(f'writing {self.filepath} failed: {e}')
+            self.error.__cause__ = e
+            return False
+
+    def close(self, full: bool = False) -> None:
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+        self.writer.close(full and self.error is None)
+        if self.error is not None:
+            raise self.error
+
+
+class Record:
+    __slots__ = ('index', 'values')
+
+    def __init__(self, index: dict):
+        self.index = index
+        self.values = [''] * len(index)
+
+    def __getitem__(self, key: str):
+        return self.values[self.index[key]]
+
+    def __setitem__(self, key: str, value) -> None:
+        position = self.index.get(key)
+        if position is not None:
+            self.values[position] = value
+
+    def update(self, data: dict) -> None:
+        for key, value in data.items():
+            self[key] = value
 
+    def to_dict(self) -> dict:
+        return dict(zip(self.index, self.values))
 
 
+_worker_parsers = {}
+
+
+def make_process_pool(workers: int) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('forkserver'))
+
+
+def parse_in_worker(parser_class, backend: str, base_url: str, method: str, *args):
+    parser = _worker_parsers.get(parser_class)
+    if parser is None:
+        parser = _worker_parsers[parser_class] = parser_class()
+    parser.backend = backend
+    parser.config.base_url = base_url
+    return getattr(parser, method)(*args)
+
 
 class Parser(ABC):
     def collect_units(self, source: Any) -> list:
@@ -83,35 +179,113 @@ class Parser(ABC):
         pass
     
 
+def class_xpath(tag: str, class_name: str, prefix: str='//') -> str:
+    return f"{prefix}{tag}[contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')]"
+
+
+class LazyXPath:
+    def __init__(self, path: str, **kwargs):
+        self.path = path
+        self.kwargs = kwargs
+        self.compiled = None
+
+    def __call__(self, node):
+        if self.compiled is None:
+            self.compiled = etree.XPath(self.path, **self.kwargs)
+        return self.compiled(node)
+
+
 class BaseParser(Parser):
+    backend = 'lxml'
+    units_xpath = LazyXPath(class_xpath('div', 'top-info') + '//a/@href', smart_strings=False)
+    address_xpath = LazyXPath(class_xpath('div', 'address'))
+    price_xpath = LazyXPath(class_xpath('div', 'price-dollar'))
+    name_xpath = LazyXPath('//div//h1')
+    info_row_xpath = LazyXPath(class_xpath('div', 'info-row'))
+    label_xpath = LazyXPath(class_xpath('div', 'label', './/'))
+    info_xpath = LazyXPath(class_xpath('div', 'info', './/'))
+
     def __init__(self, target_dict, config):
-        self.session = session
+        self.session = None
         self.config = config
         self.target_dict = target_dict
+        self.field_index = {col: i for i, col in enumerate(config.get_columns())}
+        self.label_index = {label: self.field_index[label] for label in target_dict}
         self.cache_dir = Path('cache')
-        self.cache_dir.mkdir(exist_ok=True)
+        self.cache = make_cache('sqlite', self.cache_dir)
         self.cache_lifetime = 3 * 86400  
+        self.cache_retention = 3 * 86400
+        self.limiters = HostLimiters()
+        self.metrics = metrics
+        self.in_flight = Coalescer(self.metrics)
+
+    def use_metrics(self, registry: Metrics) -> None:
+        self.metrics = registry
+        self.in_flight.metrics = registry
+
+    def set_cache_backend(self, backend: str) -> None:
+        self.cache = make_cache(backend, self.cache_dir)
+
+    def is_fresh(self, entry: CacheEntry | None) -> bool:
+        return entry is not None and time.time() - entry.fetched_at < self.cache_lifetime
+
+    def validators(self, entry: CacheEntry | None) -> dict:
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+        return headers
+
+    def request_headers(self, entry: CacheEntry | None) -> dict:
+        return {**self.config.headers, 'User-Agent': user_agents.next(), **self.validators(entry)}
+
+    def lookup_cache(self, source: str) -> tuple[CacheEntry | None, bool]:
+        with self.metrics.timer('cache_lookup'):
+            entry = self.cache.get(source)
+        fresh = self.is_fresh(entry)
+        self.metrics.inc('cache_hits' if fresh else 'cache_misses')
+        return entry, fresh
+
+    def store_response(self, source: str, entry: CacheEntry | None, status: int, text: str, headers) -> str:
+        self.metrics.inc(f'http_status_{status}')
+        if status == 304 and entry is not None:
+            self.metrics.inc('cache_revalidated')
+            self.cache.touch(source)
+            return entry.text
+        if status == 429 or status >= 500:
+            raise FetchError(f'{source} returned HTTP {status}')
+        if 200 <= status < 300:
+            with self.metrics.timer('cache_store'):
+                self.cache.put(source, text, headers.get('ETag'), headers.get('Last-Modified'))
+        return text
+
+    def get_html(self, source: str) -> str:
+        return self.in_flight.run(source, self.fetch_html, source)
+
+    def fetch_html(self, source: str) -> str:
+        entry, fresh = self.lookup_cache(source)
+        if fresh:
+            return entry.text
+
+        if self.session is None:
+            self.session = get_session()
+        with self.limiters.get(source).slot() as outcome, self.metrics.timer('fetch'):
+            response = self.session.get(source, headers=self.request_headers(entry))
+            outcome['status'] = response.status_code
+        self.metrics.inc('bytes_downloaded', len(response.content))
+        retries = getattr(response.raw, 'retries', None)
+        if retries is not None and retries.history:
+            self.metrics.inc('retries', len(retries.history))
+        return self.store_response(source, entry, response.status_code, response.text, response.headers)
+
+    def make_soup(self, text: str, name: str=None, attrs: dict={}):
+        strainer = bs4.SoupStrainer(name=name, attrs=attrs)
+        return bs4.BeautifulSoup(text, 'lxml', parse_only=strainer)
 
     def get_soup(self, source: str, name: str=None, attrs: dict={}):
-        hash_name = hashlib.md5(source.encode()).hexdigest()
-        html_path = self.cache_dir / f'{hash_name}.html'
-        
-        if html_path.exists():
-            file_age = time.time() - html_path.stat().st_mtime
-            if file_age < self.cache_lifetime:
-                text = html_path.read_text(encoding='utf-8')
-            else:
-                response = self.session.get(source)
-                text = response.text
-                html_path.write_text(text, encoding='utf-8')
-        else:
-            response = self.session.get(source)
-            text = response.text
-            html_path.write_text(text, encoding='utf-8')
-        
-        strainer = SoupStrainer(name=name, attrs=attrs)
-        soup = bs(text, 'lxml', parse_only=strainer)
-        return soup
+        return self.make_soup(self.get_html(source), name, attrs)
 
     def get_last_page(self, type_url) -> int:
         soup = self.get_soup(type_url, 'a', {'class': 'page-link'})
@@ -119,18 +293,30 @@ class BaseParser(Parser):
 
         return last_page
 
+    def collect_units_from_html(self, text: str) -> list:
+        with self.metrics.timer('collect_units'):
+            if not text or not text.strip():
+                return []
+            if self.backend == 'lxml':
+                tree = html.fromstring(text)
+                return [self.config.base_url + href for href in self.units_xpath(tree)]
+
+            soup = self.make_soup(text, 'div', {'class': 'top-info'})
+            divs = soup.find_all('a')
+            if not divs:
+                pass
+                # raise Exception('Empty divs')
+            links = [self.config.base_url + i['href'] for i in divs]
+
+            return links
+
     def collect_units(self, source: str) -> list:
-        soup = self.get_soup(source, 'div', {'class': 'top-info'})
-        divs = soup.find_all('a')
-        if not divs:
-            pass
-            # raise Exception('Empty divs')
-        links = [self.config.base_url + i['href'] for i in divs]
-
-        return links
+        return self.collect_units_from_html(self.get_html(source))
     
-    def parse_const(self, soup, targets: dict) -> dict:
-        address = soup.find('div', class_='address').text
+    def new_record(self) -> Record:
+        return Record(self.field_index)
+
+    def fill_const(self, targets: Record, address: str, price: str, name: str) -> Record:
         location = [i.strip() for i in address.split(',')]
         region, city, district = 'Чуйская область', location[0], ''
 
@@ -139,8 +325,6 @@ class BaseParser(Parser):
         elif len(location) > 1:
             region = location[0]
             city = location[1]
-        price = soup.find('div', class_='price-dollar').text.strip()
-        name = soup.find('h1').text.strip()
         targets.update({
             'Название': name,
             'Область': region,
@@ -149,29 +333,60 @@ class BaseParser(Parser):
             'Цена': price,
         })
 
-        return targets  
+        return targets
+
+    def parse_const(self, soup, targets: Record) -> Record:
+        address = soup.find('div', class_='address').text
+        price = soup.find('div', class_='price-dollar').text.strip()
+        name = soup.find('h1').text.strip()
+
+        return self.fill_const(targets, address, price, name)
       
-    def parse_dynamic(self, soup, targets: dict) -> dict:
+    def parse_dynamic(self, soup, targets: Record) -> Record:
         dynamic_data = soup.find_all('div', class_='info-row')
 
         for div in dynamic_data:
-            label = div.find('div', class_='label').text.strip()
-            value = div.find('div', class_='info').text.strip().replace('  ', '')
-            targets[label] = value
+            position = self.label_index.get(div.find('div', class_='label').text.strip())
+            if position is not None:
+                targets.values[position] = div.find('div', class_='info').text.strip().replace('  ', '')
 
         return targets
 
-    def parse(self, unit: str) -> dict:
-        soup = self.get_soup(unit, name='div')
-        d1 = self.parse_const(soup, self.config.const_target_dict)
-        d2 = self.parse_dynamic(soup, self.target_dict)
+    def parse_const_lxml(self, tree, targets: Record) -> Record:
+        address = self.address_xpath(tree)[0].text_content()
+        price = self.price_xpath(tree)[0].text_content().strip()
+        name = self.name_xpath(tree)[0].text_content().strip()
 
-        return d1 | d2
-    
-    def clean_old_cache(self, days: int = 3) -> None:
-        now = time.time()
-        lifetime = days * 86400  
+        return self.fill_const(targets, address, price, name)
 
-        for file in self.cache_dir.glob('*.html'):
-            if now - file.stat().st_mtime > lifetime:
-                file.unlink()
+    def parse_dynamic_lxml(self, tree, targets: Record) -> Record:
+        for div in self.info_row_xpath(tree):
+            position = self.label_index.get(self.label_xpath(div)[0].text_content().strip())
+            if position is not None:
+                targets.values[position] = self.info_xpath(div)[0].text_content().strip().replace('  ', '')
+
+        return targets
+
+    def parse_html(self, text: str, url: str='') -> Record:
+        record = self.new_record()
+        record['URL'] = url
+        if self.backend == 'lxml':
+            with self.metrics.timer('parse_tree'):
+                tree = html.fromstring(text)
+            with self.metrics.timer('extract'):
+                self.parse_const_lxml(tree, record)
+                self.parse_dynamic_lxml(tree, record)
+        else:
+            with self.metrics.timer('parse_tree'):
+                soup = self.make_soup(text, name='div')
+            with self.metrics.timer('extract'):
+                self.parse_const(soup, record)
+                self.parse_dynamic(soup, record)
+
+        return record
+
+    def parse(self, unit: str) -> Record:
+        return self.parse_html(self.get_html(unit), unit)
+    
+    def clean_old_cache(self, days: int | None = None) -> None:
+        self.cache.expire(days * 86400 if days is not None else self.cache_retention)
@@ -0,0 +1,90 @@
+# writers.py
+import time
+from datetime import date
+from pathlib import Path
+from parser_module.lazy import lazy_import
+from parser_module.transform import typed_columns
+from parser_module.history import HistoryWriter
+
+pd = lazy_import('pandas')
+
+
+class CsvWriter:
+    default_name = '{deal}_{property_type}.csv'
+
+    def __init__(self, filepath: Path, deal: str, property_type: str):
+        self.filepath = Path(filepath)
+
+    def read_urls(self) -> set:
+        if not self.filepath.exists():
+            return set()
+        df = pd.read_csv(self.filepath, usecols=['URL'])
+        return set(df['URL'].dropna().tolist())
+
+    def write(self, df: 'pd.DataFrame') -> None:
+        self.filepath.parent.mkdir(parents=True, exist_ok=True)
+        df.to_csv(
+            self.filepath,
+            mode='a',
+            header=not self.filepath.exists(),
+            index=False,
+        )
+
+    def close(self, full: bool = False) -> None:
+        pass
+
+
+class ParquetWriter:
+    default_name = 'listings'
+
+    def __init__(self, filepath: Path, deal: str, property_type: str):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError('pyarrow is required for the parquet output format')
+        self.pa = pyarrow
+        self.pq = pyarrow.parquet
+        self.root = Path(filepath)
+        self.partition = self.root / f'deal={deal}' / f'property_type={property_type}'
+        self.writer = None
+        self.schema = None
+        self.path = None
+
+    def read_urls(self) -> set:
+        urls = set()
+        for path in sorted(self.partition.glob('scrape_date=*/part-*.parquet')):
+            try:
+                urls.update(self.pq.read_table(path, columns=['URL']).column('URL').to_pylist())
+            except Exception as e:
+                print(f"[Error reading {path}] {e}")
+        urls.discard(None)
+        return urls
+
+    def write(self, df: 'pd.DataFrame') -> None:
+        df = pd.concat([df, typed_columns(df)], axis=1)
+        if self.writer is None:
+            self.path = self.partition / f'scrape_date={date.today().isoformat()}' / f'part-{time.time_ns()}.parquet'
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            table = self.pa.Table.from_pandas(df, preserve_index=False)
+            self.schema = table.schema
+            self.writer = self.pq.ParquetWriter(self.temp_path(), self.schema)
+        else:
+            table = self.pa.Table.from_pandas(df, schema=self.schema, preserve_index=False)
+        self.writer.write_table(table, row_group_size=len(df))
+
+    def temp_path(self) -> Path:
+        return self.path.with_name(f'.{self.path.name}.tmp')
+
+    def close(self, full: bool = False) -> None:
+        if self.writer is not None:
+            self.writer.close()
+            self.temp_path().replace(self.path)
+            self.writer = None
+
+
+WRITERS = {
+    'csv': CsvWriter,
+    'parquet': ParquetWriter,
+    'history': HistoryWriter,
+}